@@ -24,7 +24,7 @@ from agents.world_agent import world_agent
 from agents.role_factory import role_factory
 from agents.safety_agent import SafetyAgent
 from agents.emotion_agent import EmotionAgent
-from core.memory.mem0 import story_memory_manager, MemoryType
+from core.memory.mem0 import get_story_memory_manager, MemoryType
 from core.openai_client import openai_client
 # 语音服务引用（保留接口）
 STTService = None
@@ -454,7 +454,7 @@ class MultiAgent:
             emotion_context = state.get("emotion_analysis", {})
 
             # 获取相关记忆
-            relevant_memories = story_memory_manager.search_relevant_memories(
+            relevant_memories = get_story_memory_manager().search_relevant_memories(
                 query=str(user_message),
                 user_id=user_id,
                 memory_types=[
@@ -512,7 +512,7 @@ class MultiAgent:
                     self.active_story_sessions[session_id] = story_session
 
                     # 存储世界观记忆
-                    story_memory_manager.store_world_memory(
+                    get_story_memory_manager().store_world_memory(
                         world_data, user_id, session_id  # type: ignore
                     )
 
@@ -629,7 +629,7 @@ class MultiAgent:
                             "learning_point": response.get("learning_point"),
                         }
 
-                        story_memory_manager.store_interaction_history(
+                        get_story_memory_manager().store_interaction_history(
                             interaction_data,
                             user_id,
                             session_id,
@@ -675,7 +675,7 @@ class MultiAgent:
                     "timestamp": datetime.now().isoformat(),
                 }
 
-                story_memory_manager.store_interaction_history(
+                get_story_memory_manager().store_interaction_history(
                     interaction_data, user_id, session_id, f"session_{session_id}"
                 )
 
@@ -885,7 +885,7 @@ class MultiAgent:
         """获取系统统计信息"""
         return {
             "active_story_sessions": len(self.active_story_sessions),
-            "memory_stats": story_memory_manager.get_memory_statistics(),
+            "memory_stats": get_story_memory_manager().get_memory_statistics(),
             "role_factory_stats": await role_factory.get_factory_statistics(),
             "total_sessions_processed": len(self.active_story_sessions),  # 简化统计
         }
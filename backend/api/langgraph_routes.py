@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 import logging
 
@@ -9,7 +9,7 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from agents.multi_agent import multi_agent
+from agents.multi_agent import MultiAgent, multi_agent
 from utils.db.database import get_db
 from utils.db.database_service import DatabaseService
 from models.user import Conversation
@@ -19,10 +19,56 @@ from schemas.chat import ChatRequest, ChatResponse
 router = APIRouter(prefix="/langgraph", tags=["LangGraph"])
 
 
+def get_multi_agent() -> MultiAgent:
+    """获取多代理系统实例（测试中可通过 app.dependency_overrides 替换）"""
+    return multi_agent
+
+
+def _conversation_turns(conv: Conversation) -> list:
+    """
+    获取对话记录中的每一轮对话
+
+    聊天接口把每轮对话追加到 conversation_history；早期记录只有
+    user_input/agent_response 两列，按单轮对话处理。
+    """
+    history = getattr(conv, 'conversation_history', None)
+    if history:
+        return history
+    if getattr(conv, 'user_input', None) is None and getattr(conv, 'agent_response', None) is None:
+        return []
+    return [{
+        "user_input": getattr(conv, 'user_input', None) or '',
+        "agent_response": getattr(conv, 'agent_response', None) or '{}',
+    }]
+
+
+def _as_utc(value: datetime) -> datetime:
+    """数据库中的时间按UTC写入，读出为无时区时间时补上UTC时区"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _turn_time(turn: dict, fallback: datetime) -> datetime:
+    """获取一轮对话的UTC时间，没有或无法解析时间戳时使用fallback"""
+    try:
+        return _as_utc(datetime.fromisoformat(turn['timestamp']))
+    except (KeyError, TypeError, ValueError):
+        return fallback
+
+
+def _parse_agent_response(turn: dict) -> dict:
+    """解析一轮对话中以JSON字符串保存的代理回复，无法解析时返回空字典"""
+    try:
+        agent_response = json.loads(turn.get('agent_response') or '{}')
+    except json.JSONDecodeError:
+        return {}
+    return agent_response if isinstance(agent_response, dict) else {}
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def langgraph_chat(
     request: ChatRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    agent: MultiAgent = Depends(get_multi_agent)
 ):
     """
     多代理系统驱动的智能聊天接口
@@ -36,7 +82,7 @@ async def langgraph_chat(
     """
     try:
         # 执行多代理系统
-        result = await multi_agent.process_message(
+        result = await agent.process_message(
             user_message=request.content,
             user_id=str(request.user_id or 1),
             session_id=str(request.session_id) if request.session_id is not None else None
@@ -77,7 +123,8 @@ async def langgraph_chat(
 
 @router.post("/chat/stream")
 async def langgraph_chat_stream(
-    request: ChatRequest
+    request: ChatRequest,
+    agent: MultiAgent = Depends(get_multi_agent)
 ):
     """
     多代理系统流式聊天接口（实验性）
@@ -87,7 +134,7 @@ async def langgraph_chat_stream(
     try:
         # 这里可以实现流式响应
         # 目前返回完整结果作为演示
-        result = await multi_agent.process_message(
+        result = await agent.process_message(
             user_message=request.content,
             user_id=str(request.user_id or 1),
             session_id=str(request.session_id) if request.session_id is not None else None
@@ -107,7 +154,8 @@ async def langgraph_chat_stream(
 @router.get("/workflow/state")
 async def get_workflow_state(
     user_id: str,
-    session_id: Optional[str] = Query(None)
+    session_id: Optional[str] = Query(None),
+    agent: MultiAgent = Depends(get_multi_agent)
 ):
     """
     获取工作流状态信息
@@ -117,7 +165,7 @@ async def get_workflow_state(
     try:
         # 获取图的结构信息
         graph_structure = {
-            "nodes": list(multi_agent.graph.nodes.keys()),
+            "nodes": list(agent.graph.nodes.keys()),
             "edges": [],
             "entry_point": "input_processor",
             "end_point": "END"
@@ -154,7 +202,7 @@ async def get_workflow_state(
                 "user_id": user_id,
                 "session_id": session_id
             },
-            "system_stats": await multi_agent.get_system_statistics()
+            "system_stats": await agent.get_system_statistics()
         }
 
     except Exception as e:
@@ -177,42 +225,49 @@ async def get_conversation_flow_analytics(
     try:
         # 获取用户对话数据
         from datetime import timedelta
-        cutoff_date = datetime.now() - timedelta(days=days)
+        # 请求开始时取一次当前时间，截止日期和缺省时间戳共用
+        # 数据库中的时间均为UTC
+        now = datetime.now(timezone.utc)
+        cutoff_date = now - timedelta(days=days)
 
+        # 新的对话轮次追加到已有记录并只更新updated_at，按updated_at筛选记录
         conversations = db.query(Conversation).filter(
             Conversation.user_id == user_id,
-            Conversation.created_at >= cutoff_date
+            Conversation.updated_at >= cutoff_date
         ).order_by(Conversation.created_at).all()
 
         # 分析agent使用模式
         agent_flow = []
         agent_transitions = {}
 
-        for i, conv in enumerate(conversations):
+        # 同一代理类型的多轮对话保存在一条记录中，按轮展开、丢弃分析期之前的轮次后按时间排序
+        for conv in conversations:
             agent_type = getattr(conv, 'agent_type', 'unknown')
-            timestamp = getattr(conv, 'created_at', datetime.now())
-
-            agent_flow.append({
-                "agent": agent_type,
-                "timestamp": timestamp.isoformat(),
-                "content_preview": getattr(conv, 'user_input', '')[:50] + "..."
-            })
-
-            # 分析agent转换
-            if i > 0:
-                prev_agent = getattr(conversations[i-1], 'agent_type', 'unknown')
-                transition_key = f"{prev_agent} -> {agent_type}"
-                agent_transitions[transition_key] = agent_transitions.get(transition_key, 0) + 1
+            created_at = _as_utc(getattr(conv, 'created_at', None) or now)
+            for turn in _conversation_turns(conv):
+                turn_time = _turn_time(turn, created_at)
+                if turn_time < cutoff_date:
+                    continue
+                agent_flow.append({
+                    "agent": agent_type,
+                    "timestamp": turn_time.isoformat(),
+                    "content_preview": (turn.get('user_input') or '')[:50] + "..."
+                })
+        agent_flow.sort(key=lambda item: item["timestamp"])
+
+        # 分析agent转换
+        for prev, curr in zip(agent_flow, agent_flow[1:]):
+            transition_key = f"{prev['agent']} -> {curr['agent']}"
+            agent_transitions[transition_key] = agent_transitions.get(transition_key, 0) + 1
 
         # 统计信息
         agent_stats = {}
-        for conv in conversations:
-            agent_type = getattr(conv, 'agent_type', 'unknown')
-            agent_stats[agent_type] = agent_stats.get(agent_type, 0) + 1
+        for item in agent_flow:
+            agent_stats[item["agent"]] = agent_stats.get(item["agent"], 0) + 1
 
         return {
             "analysis_period": f"{days}天",
-            "total_conversations": len(conversations),
+            "total_conversations": len(agent_flow),
             "agent_usage": agent_stats,
             "agent_transitions": agent_transitions,
             "conversation_flow": agent_flow,
@@ -282,21 +337,25 @@ async def get_session_history(
         # 获取对话记录
         conversations = DatabaseService.get_conversations_by_session(db, session_id)
 
-        # 手动应用限制
-        if len(conversations) > limit:
-            conversations = conversations[:limit]
-
-        history = []
+        # 数据库中的时间均为UTC
+        now = datetime.now(timezone.utc)
+        turns = []
         for conv in conversations:
-            try:
-                agent_response = json.loads(getattr(conv, 'agent_response', '{}'))
-            except json.JSONDecodeError:
-                agent_response = {}
+            created_at = _as_utc(getattr(conv, 'created_at', None) or now)
+            for index, turn in enumerate(_conversation_turns(conv)):
+                turns.append((_turn_time(turn, created_at), index, conv, turn))
 
+        # 同一代理类型的多轮对话保存在一条记录中，展开后按时间排序，只保留最近的limit轮
+        turns.sort(key=lambda item: item[0])
+        history = []
+        for turn_time, index, conv, turn in turns[-limit:]:
+            agent_response = _parse_agent_response(turn)
             history.append({
+                # id为对话记录ID，同一记录中的各轮共用，与turn_index一起唯一标识一轮对话
                 "id": getattr(conv, 'id', 0),
-                "timestamp": getattr(conv, 'created_at', datetime.now()).isoformat(),
-                "user_input": getattr(conv, 'user_input', ''),
+                "turn_index": index,
+                "timestamp": turn_time.isoformat(),
+                "user_input": turn.get('user_input') or '',
                 "agent_type": getattr(conv, 'agent_type', 'unknown'),
                 "response": agent_response.get('response', ''),
                 "metadata": agent_response.get('metadata', {}),
@@ -334,7 +393,7 @@ async def get_user_insights(
 
         # 分析模式
         insights = {
-            "total_conversations": len(conversations),
+            "total_conversations": 0,
             "agent_preferences": {},
             "safety_incidents": 0,
             "learning_progress": {},
@@ -343,13 +402,14 @@ async def get_user_insights(
 
         for conv in conversations:
             agent_type = getattr(conv, 'agent_type', 'unknown')
-            insights["agent_preferences"][agent_type] = insights["agent_preferences"].get(agent_type, 0) + 1
+            for turn in _conversation_turns(conv):
+                insights["total_conversations"] += 1
+                insights["agent_preferences"][agent_type] = insights["agent_preferences"].get(agent_type, 0) + 1
 
-            # 尝试解析agent_response获取更详细的信息
-            try:
-                agent_response = json.loads(getattr(conv, 'agent_response', '{}'))
-                metadata = agent_response.get('metadata', {})
-                safety_info = agent_response.get('safety_info', {})
+                # 解析agent_response获取更详细的信息
+                agent_response = _parse_agent_response(turn)
+                metadata = agent_response.get('metadata') or {}
+                safety_info = agent_response.get('safety_info') or {}
 
                 if not safety_info.get('passed', True):
                     insights["safety_incidents"] += 1
@@ -363,9 +423,6 @@ async def get_user_insights(
                     emotion = metadata.get('emotion', '未知')
                     insights["emotional_patterns"][emotion] = insights["emotional_patterns"].get(emotion, 0) + 1
 
-            except (json.JSONDecodeError, AttributeError):
-                pass
-
         return insights
 
     except Exception as e:
@@ -374,13 +431,13 @@ async def get_user_insights(
 
 
 @router.post("/test/workflow")
-async def test_workflow():
+async def test_workflow(agent: MultiAgent = Depends(get_multi_agent)):
     """
     测试多代理系统（仅用于开发调试）
     """
     try:
         # 简单的测试用例
-        test_result = await multi_agent.process_message(
+        test_result = await agent.process_message(
             user_message="你好，我想听个故事",
             user_id="test_user",
             session_id="test_session"
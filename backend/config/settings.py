@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from typing import Optional
 from pydantic_settings import BaseSettings
 
@@ -64,6 +65,11 @@ class Settings(BaseSettings):
     mem0_embedding_model: str = "nomic-embed-text:v1.5"  # DeepSeek兼容的嵌入模型
     mem0_embedding_dims: int = 768
     mem0_cache_ttl: int = 300  # 缓存5分钟
+    # 以下两项只对Qdrant服务端生效，本地模式（mem0_qdrant_path）会忽略
+    mem0_qdrant_quantization: bool = False  # 集合启用int8标量量化
+    mem0_qdrant_hnsw_in_ram: bool = False  # HNSW索引与向量常驻内存
+    mem0_embedding_cache_enabled: bool = False  # 嵌入向量sqlite缓存（需要时开启，并将路径指向数据目录）
+    mem0_embedding_cache_path: str = "./embedding_cache.db"
 
     # TTS语音合成配置
     tts_provider: str = "edge-tts"  # edge-tts, gtts, pyttsx3, fish-speech, chattts
@@ -122,5 +128,11 @@ class Settings(BaseSettings):
     cors_allow_methods: list = ["*"]
     cors_allow_headers: list = ["*"]
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """获取配置实例，进程内只解析一次环境变量和.env文件"""
+    return Settings()
+
+
 # 全局配置实例
-settings = Settings()
+settings = get_settings()
@@ -0,0 +1,102 @@
+"""
+嵌入向量磁盘缓存
+
+以文本内容摘要为键，将嵌入向量持久化到本地sqlite，
+相同内容再次写入或检索时直接复用，不再请求嵌入模型。
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """基于sqlite的嵌入向量缓存（写穿透）"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        """模型名与文本内容共同决定缓存键"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[List[float]]:
+        """读取缓存的向量，未命中返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def put(self, key: bytes, vector: List[float]) -> None:
+        """写入向量（float32存储）"""
+        blob = array("f", vector).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                (key, blob),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbedder:
+    """
+    mem0嵌入模型包装器
+
+    embed调用先查询磁盘缓存，未命中时调用原嵌入模型并写回缓存；
+    其余属性透传给原嵌入模型。
+    """
+
+    def __init__(self, embedder: Any, cache: EmbeddingCache, model: str):
+        self._embedder = embedder
+        self._cache = cache
+        self._model = model
+
+    def embed(self, text: str, memory_action: Optional[str] = None) -> List[float]:
+        key = self._cache.make_key(self._model, text)
+        try:
+            vector = self._cache.get(key)
+        except sqlite3.Error as e:
+            logger.warning("读取嵌入缓存失败: %s", e)
+            vector = None
+        if vector is not None:
+            return vector
+
+        vector = self._embedder.embed(text, memory_action)
+        try:
+            self._cache.put(key, vector)
+        except sqlite3.Error as e:
+            logger.warning("写入嵌入缓存失败: %s", e)
+        return vector
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._embedder, name)
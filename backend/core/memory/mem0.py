@@ -5,10 +5,15 @@ mem0集成模块 - 故事记忆管理系统
 检索和管理功能，优化性能并支持长期记忆管理。
 """
 
-from typing import Dict, Any, List, Optional, TypedDict
+from typing import Dict, Any, List, Optional, Tuple, TypedDict, Union
 from enum import Enum
+import asyncio
+import functools
+import hashlib
 import json
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 import logging
@@ -19,13 +24,37 @@ try:
 except ImportError:
     Memory = None
 
+# orjson可选，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from config.settings import settings
+from core.memory.embedding_cache import CachedEmbedder, EmbeddingCache
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# 按秒缓存的 (秒级时间戳, ISO时间字符串)，created_at只需要秒级精度。
+# 整个元组一次赋值替换，并发读取时时间戳与字符串始终配对
+_NOW_CACHE: Tuple[int, str] = (0, "")
+
+
+def _iso_now() -> str:
+    """返回当前时间的ISO字符串，同一秒内复用已格式化的结果"""
+    global _NOW_CACHE
+    t = int(time.time())
+    cached_ts, cached_iso = _NOW_CACHE
+    if t == cached_ts:
+        return cached_iso
+    iso = datetime.fromtimestamp(t).isoformat()
+    _NOW_CACHE = (t, iso)
+    return iso
+
+
 class MemoryType(str, Enum):
     """记忆类型枚举"""
 
@@ -37,9 +66,40 @@ class MemoryType(str, Enum):
     LEARNING_OUTCOME = "learning_outcome"  # 学习成果
 
 
-@dataclass
+class _LazyTimestamp:
+    """
+    时间字段描述符，包装dataclass生成的slot
+
+    赋值时原样保存datetime或ISO字符串；读取到字符串时解析为datetime并写回slot，
+    之后的读取直接返回解析结果。
+    """
+
+    __slots__ = ("_slot",)
+
+    def __init__(self, slot: Any):
+        self._slot = slot
+
+    def __get__(self, obj: Any, objtype: Any = None) -> Any:
+        if obj is None:
+            return self
+        value = self._slot.__get__(obj, objtype)
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+            self._slot.__set__(obj, value)
+        return value
+
+    def __set__(self, obj: Any, value: Any) -> None:
+        self._slot.__set__(obj, value)
+
+
+@dataclass(slots=True)
 class MemoryMetadata:
-    """记忆元数据"""
+    """
+    记忆元数据
+
+    created_at/last_accessed 可以传入datetime或ISO字符串，字符串在首次访问时才解析，
+    只读取内容的调用方不需要承担解析开销。
+    """
 
     memory_id: str
     memory_type: MemoryType
@@ -47,15 +107,20 @@ class MemoryMetadata:
     story_id: Optional[str] = None
     chapter_id: Optional[str] = None
     role_id: Optional[str] = None
-    created_at: datetime = field(default_factory=datetime.now)
+    created_at: Union[datetime, str] = field(default_factory=_iso_now)
     updated_at: datetime = field(default_factory=datetime.now)
     access_count: int = 0
-    last_accessed: Optional[datetime] = None
+    last_accessed: Union[datetime, str, None] = None
     importance_score: float = 0.5  # 0-1的重要性评分
     expiration_days: Optional[int] = None  # 过期天数，None表示永不过期
 
 
-@dataclass
+for _name in ("created_at", "last_accessed"):
+    setattr(MemoryMetadata, _name, _LazyTimestamp(getattr(MemoryMetadata, _name)))
+del _name
+
+
+@dataclass(slots=True)
 class MemorySearchResult:
     """记忆搜索结果"""
 
@@ -67,6 +132,60 @@ class MemorySearchResult:
     context_summary: Optional[str] = None
 
 
+class SearchSpec(TypedDict, total=False):
+    """批量检索的单条检索条件，query和user_id必填"""
+
+    query: str
+    user_id: str
+    story_id: Optional[str]
+    memory_types: Optional[List[MemoryType]]
+    limit: int
+
+
+def _dumps_payload(data: Any) -> str:
+    """将嵌套的业务数据序列化为JSON字符串，作为扁平字段写入mem0元数据"""
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            default=str,
+            # datetime交给default=str处理，与标准库json回退路径的输出一致
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        ).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _search_key(
+    user_id: str,
+    query: str,
+    story_id: Optional[str],
+    memory_types: Tuple[str, ...],
+    limit: int,
+) -> int:
+    """
+    生成检索缓存键
+
+    记忆类型排序后参与计算，与调用方传入顺序无关；返回定长的128位整数摘要，
+    避免把任意长度的查询文本直接作为字典键。
+    """
+    raw = f"{user_id}|{query}|{story_id or 'all'}|{','.join(sorted(memory_types))}|{limit}"
+    return int.from_bytes(
+        hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest(), "big"
+    )
+
+
+def _is_local_qdrant(qdrant: Any) -> bool:
+    """
+    判断qdrant客户端是否运行在本地模式（path或:memory:）
+
+    本地模式下检索为精确暴力搜索，集合的量化、HNSW等参数不会生效。
+    """
+    try:
+        from qdrant_client.local.qdrant_local import QdrantLocal
+    except ImportError:
+        return False
+    return isinstance(getattr(qdrant, "_client", None), QdrantLocal)
+
+
 class StoryMemoryManager:
     """
     故事记忆管理器
@@ -79,9 +198,15 @@ class StoryMemoryManager:
     5. 性能优化检索
     """
 
+    # 缓存容量上限，超出后淘汰最久未使用的条目
+    CACHE_MAX_SIZE = 2048
+
     def __init__(self):
         self.memory_client = self._init_memory_client()
-        self.memory_cache: Dict[str, Dict[str, Any]] = {}  # 简单的内存缓存
+        self._enable_embedding_cache(self.memory_client)
+        # 有界LRU缓存: key -> (写入时间, 数据)，读取时惰性淘汰过期条目
+        self.memory_cache: "OrderedDict[Union[str, int], Tuple[float, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         self.cache_ttl = settings.mem0_cache_ttl  # 缓存时间
         self.performance_stats = {
             "total_searches": 0,
@@ -90,6 +215,9 @@ class StoryMemoryManager:
             "memory_count": 0,
         }
 
+        # 故事上下文固定查询的向量缓存: story_id -> [世界观, 角色, 进度]
+        self._ctx_query_embeddings: Dict[str, List[List[float]]] = {}
+
         logger.info("故事记忆管理器初始化完成")
 
     def _init_memory_client(self) -> Optional[Memory]: # type: ignore
@@ -105,36 +233,11 @@ class StoryMemoryManager:
 
         try:
             # 使用Qdrant本地模式（Windows兼容，无需服务器）
-            config = {
-                "vector_store": {
-                    "provider": settings.mem0_vector_store_provider,
-                    "config": {
-                        "path": settings.mem0_qdrant_path,
-                        "collection_name": settings.mem0_collection_name,
-                    },
-                },
-                "llm": {
-                    "provider": "openai",
-                    "config": {
-                        "model": settings.openai_default_model,
-                        "temperature": settings.openai_temperature,
-                        "max_tokens": settings.openai_max_tokens,
-                        "api_key": settings.openai_api_key,
-                        "openai_base_url": settings.openai_base_url,
-                    },
-                },
-                "embedder": {
-                    "provider": "ollama",
-                    "config": {
-                        "model": settings.mem0_embedding_model,
-                        "ollama_base_url": settings.mem0_base_url,
-                        "embedding_dims": settings.mem0_embedding_dims,
-                    },
-                },
-            }
+            config = self._build_mem0_config(include_vector_store=True)
             logger.info("使用Qdrant本地模式初始化mem0客户端")
             print(">>>>>>>>>>>>>>>>>>>>>>", config)
             client = Memory.from_config(config_dict=config)
+            self._tune_vector_store(client)
 
             # 测试客户端是否正常工作
             test_result = client.search(query="test", user_id="test", limit=1)
@@ -142,7 +245,7 @@ class StoryMemoryManager:
             return client
 
         except Exception as e:
-            logger.error(f"初始化mem0客户端失败: {e}")
+            logger.error("初始化mem0客户端失败: %s", e)
 
             # 检查是否是维度不匹配错误
             if "shapes" in str(e) and "not aligned" in str(e):
@@ -156,7 +259,11 @@ class StoryMemoryManager:
 
             # 检查是否是模型不存在错误
             if "Model Not Exist" in str(e):
-                logger.error(f"模型配置错误: {settings.mem0_embedding_model} 在 {settings.openai_base_url} 不存在")
+                logger.error(
+                    "模型配置错误: %s 在 %s 不存在",
+                    settings.mem0_embedding_model,
+                    settings.openai_base_url,
+                )
                 logger.info("请检查嵌入模型配置，切换到内存模式")
                 return self._init_memory_only_client()
 
@@ -164,6 +271,120 @@ class StoryMemoryManager:
             logger.info("使用内存模式作为降级方案")
             return self._init_memory_only_client()
 
+    def _build_mem0_config(self, include_vector_store: bool) -> Dict[str, Any]:
+        """
+        构建mem0配置
+
+        Args:
+            include_vector_store: 是否包含Qdrant向量库配置，内存模式下不包含
+        """
+        config: Dict[str, Any] = {
+            "llm": {
+                "provider": "openai",
+                "config": {
+                    "model": settings.openai_default_model,
+                    "temperature": settings.openai_temperature,
+                    "max_tokens": settings.openai_max_tokens,
+                    "api_key": settings.openai_api_key,
+                    "openai_base_url": settings.openai_base_url,
+                },
+            },
+            "embedder": {
+                "provider": "ollama",
+                "config": {
+                    "model": settings.mem0_embedding_model,
+                    "ollama_base_url": settings.mem0_base_url,
+                    "embedding_dims": settings.mem0_embedding_dims,
+                },
+            },
+        }
+        if include_vector_store:
+            config["vector_store"] = {
+                "provider": settings.mem0_vector_store_provider,
+                "config": {
+                    "path": settings.mem0_qdrant_path,
+                    "collection_name": settings.mem0_collection_name,
+                },
+            }
+        return config
+
+    def _enable_embedding_cache(self, client: Any) -> None:
+        """为mem0的嵌入模型启用sqlite磁盘缓存，相同内容不再重复计算向量"""
+        if not settings.mem0_embedding_cache_enabled or client is None:
+            return
+
+        embedder = getattr(client, "embedding_model", None)
+        if embedder is None or isinstance(embedder, CachedEmbedder):
+            return
+
+        try:
+            cache = EmbeddingCache(settings.mem0_embedding_cache_path)
+            client.embedding_model = CachedEmbedder(
+                embedder, cache, settings.mem0_embedding_model
+            )
+            logger.info("已启用嵌入向量缓存: %s", settings.mem0_embedding_cache_path)
+        except Exception as e:
+            logger.warning("启用嵌入向量缓存失败: %s", e)
+
+    def _tune_vector_store(self, client: Any) -> None:
+        """
+        调整Qdrant集合的存储参数
+
+        mem0的qdrant配置不接受量化等参数，因此在集合创建后直接通过
+        qdrant客户端更新集合配置。只对Qdrant服务端生效，本地模式会忽略这些参数，
+        直接跳过。失败时只记录警告，不影响客户端使用。
+        """
+        if settings.mem0_vector_store_provider != "qdrant":
+            return
+
+        vector_store = getattr(client, "vector_store", None)
+        qdrant = getattr(vector_store, "client", None)
+        if qdrant is None:
+            return
+
+        if _is_local_qdrant(qdrant):
+            if settings.mem0_qdrant_quantization or settings.mem0_qdrant_hnsw_in_ram:
+                logger.info("Qdrant本地模式不支持量化和HNSW参数，跳过集合配置调整")
+            return
+
+        try:
+            from qdrant_client import models
+
+            update_kwargs: Dict[str, Any] = {}
+            if settings.mem0_qdrant_quantization:
+                # int8标量量化：向量内存占用约为float32的1/4
+                update_kwargs["quantization_config"] = models.ScalarQuantization(
+                    scalar=models.ScalarQuantizationConfig(
+                        type=models.ScalarType.INT8,
+                        quantile=0.99,
+                        always_ram=True,
+                    )
+                )
+
+            if settings.mem0_qdrant_hnsw_in_ram:
+                # HNSW图与原始向量常驻内存，避免磁盘索引带来的高延迟
+                update_kwargs["hnsw_config"] = models.HnswConfigDiff(
+                    m=16,
+                    ef_construct=128,
+                    full_scan_threshold=10000,
+                    on_disk=False,
+                )
+                update_kwargs["optimizers_config"] = models.OptimizersConfigDiff(
+                    indexing_threshold=20000,
+                )
+                # mem0创建的是未命名向量，对应的键为空字符串
+                update_kwargs["vectors_config"] = {
+                    "": models.VectorParamsDiff(on_disk=False)
+                }
+
+            if update_kwargs:
+                qdrant.update_collection(
+                    collection_name=vector_store.collection_name, **update_kwargs
+                )
+                logger.info("已更新Qdrant集合配置: %s", ", ".join(update_kwargs))
+        except Exception as e:
+            logger.warning("更新Qdrant集合配置失败，使用默认配置: %s", e)
+
     def _clean_and_retry_mem0_init(self) -> Optional[Memory]:
         """清理迁移集合并重试Mem0初始化"""
         try:
@@ -175,7 +396,7 @@ class StoryMemoryManager:
 
             # 方案1：使用新的集合名称
             new_collection_name = f"{settings.mem0_collection_name}_v2"
-            logger.info(f"尝试使用新的集合名称: {new_collection_name}")
+            logger.info("尝试使用新的集合名称: %s", new_collection_name)
 
             # 临时修改配置使用新的集合名称
             original_collection = settings.mem0_collection_name
@@ -199,33 +420,14 @@ class StoryMemoryManager:
                 return self._init_memory_only_client()
 
         except Exception as e:
-            logger.error(f"清理迁移集合失败: {e}")
+            logger.error("清理迁移集合失败: %s", e)
             logger.info("使用内存模式作为降级方案")
             return self._init_memory_only_client()
 
     def _init_memory_only_client(self) -> Optional[Memory]:
         """初始化仅内存模式的mem0客户端"""
         try:
-            config = {
-                "llm": {
-                    "provider": "openai",
-                    "config": {
-                        "model": settings.openai_default_model,
-                        "temperature": settings.openai_temperature,
-                        "max_tokens": settings.openai_max_tokens,
-                        "api_key": settings.openai_api_key,
-                        "openai_base_url": settings.openai_base_url,
-                    },
-                },
-                "embedder": {
-                    "provider": "ollama",
-                    "config": {
-                        "model": settings.mem0_embedding_model,
-                        "ollama_base_url": settings.mem0_base_url,
-                        "embedding_dims": settings.mem0_embedding_dims,
-                    },
-                },
-            }
+            config = self._build_mem0_config(include_vector_store=False)
             logger.info("使用内存模式初始化mem0客户端")
             
             if Memory is None:  # 兼容mem0未安装的情况
@@ -235,7 +437,7 @@ class StoryMemoryManager:
             logger.info("内存模式Mem0客户端初始化成功")
             return client
         except Exception as e:
-            logger.error(f"内存模式也初始化失败: {e}")
+            logger.error("内存模式也初始化失败: %s", e)
 
             # 检查是否是维度不匹配错误
             if "shapes" in str(e) and "not aligned" in str(e):
@@ -266,16 +468,16 @@ class StoryMemoryManager:
                 return f"mem0_disabled_{int(time.time())}"
 
             # 构建记忆内容
-            memory_content = f"""
-故事世界观设定：
-- 世界名称: {world_data.get('world_name', '未命名')}
-- 世界类型: {world_data.get('world_type', '通用')}
-- 背景设定: {world_data.get('background', '')}
-- 世界规则: {world_data.get('rules', '')}
-- 特色: {', '.join(world_data.get('features', []))}
-- 推荐角色: {', '.join(world_data.get('roles', []))}
-- 教育主题: {', '.join(world_data.get('themes', []))}
-            """
+            memory_content = "".join((
+                "\n故事世界观设定：\n- 世界名称: ", str(world_data.get('world_name', '未命名')),
+                "\n- 世界类型: ", str(world_data.get('world_type', '通用')),
+                "\n- 背景设定: ", str(world_data.get('background', '')),
+                "\n- 世界规则: ", str(world_data.get('rules', '')),
+                "\n- 特色: ", ', '.join(world_data.get('features', [])),
+                "\n- 推荐角色: ", ', '.join(world_data.get('roles', [])),
+                "\n- 教育主题: ", ', '.join(world_data.get('themes', [])),
+                "\n",
+            ))
 
             # 存储到mem0
             result = self.memory_client.add(
@@ -284,8 +486,8 @@ class StoryMemoryManager:
                 metadata={
                     "memory_type": MemoryType.WORLD_SETTING.value,
                     "story_id": story_id,
-                    "world_data": world_data,
-                    "created_at": datetime.now().isoformat(),
+                    "world_data": _dumps_payload(world_data),
+                    "created_at": _iso_now(),
                     "importance_score": 0.9,  # 世界观设定很重要
                 },
             )
@@ -301,16 +503,16 @@ class StoryMemoryManager:
                     "metadata": {
                         "user_id": user_id,
                         "story_id": story_id,
-                        "created_at": datetime.now().isoformat(),
+                        "created_at": _iso_now(),
                     },
                 },
             )
 
-            logger.info(f"存储世界观记忆: {memory_id}")
+            logger.debug("存储世界观记忆: %s", memory_id)
             return memory_id
 
         except Exception as e:
-            logger.error(f"存储世界观记忆失败: {e}")
+            logger.error("存储世界观记忆失败: %s", e)
             return f"error_{int(time.time())}"
 
     def store_role_memory(
@@ -327,15 +529,15 @@ class StoryMemoryManager:
                 logger.warning("Mem0客户端不可用，跳过角色记忆存储")
                 return f"mem0_disabled_{int(time.time())}"
 
-            memory_content = f"""
-角色信息：
-- 角色名称: {role_data.get('name', '')}
-- 角色类型: {role_data.get('role', '')}
-- 性格特点: {role_data.get('personality', '')}
-- 背景故事: {role_data.get('background', '')}
-- 特殊能力: {', '.join(role_data.get('special_abilities', []))}
-- 安全规则: {', '.join(role_data.get('safety_rules', []))}
-            """
+            memory_content = "".join((
+                "\n角色信息：\n- 角色名称: ", str(role_data.get('name', '')),
+                "\n- 角色类型: ", str(role_data.get('role', '')),
+                "\n- 性格特点: ", str(role_data.get('personality', '')),
+                "\n- 背景故事: ", str(role_data.get('background', '')),
+                "\n- 特殊能力: ", ', '.join(role_data.get('special_abilities', [])),
+                "\n- 安全规则: ", ', '.join(role_data.get('safety_rules', [])),
+                "\n",
+            ))
 
             result = self.memory_client.add(
                 messages=[{"role": "system", "content": memory_content}],
@@ -344,8 +546,8 @@ class StoryMemoryManager:
                     "memory_type": MemoryType.CHARACTER_INFO.value,
                     "story_id": story_id,
                     "chapter_id": chapter_id,
-                    "role_data": role_data,
-                    "created_at": datetime.now().isoformat(),
+                    "role_data": _dumps_payload(role_data),
+                    "created_at": _iso_now(),
                     "importance_score": 0.8,
                 },
             )
@@ -367,11 +569,11 @@ class StoryMemoryManager:
                 },
             )
 
-            logger.info(f"存储角色记忆: {memory_id}")
+            logger.debug("存储角色记忆: %s", memory_id)
             return memory_id
 
         except Exception as e:
-            logger.error(f"存储角色记忆失败: {e}")
+            logger.error("存储角色记忆失败: %s", e)
             return f"error_{int(time.time())}"
 
     def store_story_progress(
@@ -388,15 +590,16 @@ class StoryMemoryManager:
                 logger.warning("Mem0客户端不可用，跳过故事进度存储")
                 return f"mem0_disabled_{int(time.time())}"
 
-            memory_content = f"""
-故事进度更新：
-- 章节标题: {progress_data.get('chapter_title', '')}
-- 当前进度: {progress_data.get('current_step', 0)}/{progress_data.get('total_steps', 0)}
-- 完成度: {progress_data.get('completion_percentage', 0)}%
-- 用户参与度: {progress_data.get('engagement_score', 0)}
-- 用时: {progress_data.get('time_spent_minutes', 0)}分钟
-- 重要事件: {progress_data.get('key_events', '无')}
-            """
+            memory_content = "".join((
+                "\n故事进度更新：\n- 章节标题: ", str(progress_data.get('chapter_title', '')),
+                "\n- 当前进度: ", str(progress_data.get('current_step', 0)),
+                "/", str(progress_data.get('total_steps', 0)),
+                "\n- 完成度: ", str(progress_data.get('completion_percentage', 0)),
+                "%\n- 用户参与度: ", str(progress_data.get('engagement_score', 0)),
+                "\n- 用时: ", str(progress_data.get('time_spent_minutes', 0)),
+                "分钟\n- 重要事件: ", str(progress_data.get('key_events', '无')),
+                "\n",
+            ))
 
             result = self.memory_client.add(
                 messages=[{"role": "system", "content": memory_content}],
@@ -405,8 +608,8 @@ class StoryMemoryManager:
                     "memory_type": MemoryType.STORY_PROGRESS.value,
                     "story_id": story_id,
                     "chapter_id": chapter_id,
-                    "progress_data": progress_data,
-                    "created_at": datetime.now().isoformat(),
+                    "progress_data": _dumps_payload(progress_data),
+                    "created_at": _iso_now(),
                     "importance_score": 0.6,
                 },
             )
@@ -426,11 +629,11 @@ class StoryMemoryManager:
                 },
             )
 
-            logger.info(f"存储故事进度: {memory_id}")
+            logger.debug("存储故事进度: %s", memory_id)
             return memory_id
 
         except Exception as e:
-            logger.error(f"存储故事进度失败: {e}")
+            logger.error("存储故事进度失败: %s", e)
             return f"error_{int(time.time())}"
 
     def store_interaction_history(
@@ -447,14 +650,14 @@ class StoryMemoryManager:
                 logger.warning("Mem0客户端不可用，跳过互动历史存储")
                 return f"mem0_disabled_{int(time.time())}"
 
-            memory_content = f"""
-故事互动记录：
-- 角色: {interaction_data.get('role_name', '')}
-- 用户输入: {interaction_data.get('user_message', '')}
-- 角色回应: {interaction_data.get('role_response', '')[:200]}...
-- 情感状态: {interaction_data.get('emotion', '')}
-- 学习价值: {interaction_data.get('learning_point', '')}
-            """
+            memory_content = "".join((
+                "\n故事互动记录：\n- 角色: ", str(interaction_data.get('role_name', '')),
+                "\n- 用户输入: ", str(interaction_data.get('user_message', '')),
+                "\n- 角色回应: ", str(interaction_data.get('role_response', ''))[:200],
+                "...\n- 情感状态: ", str(interaction_data.get('emotion', '')),
+                "\n- 学习价值: ", str(interaction_data.get('learning_point', '')),
+                "\n",
+            ))
 
             result = self.memory_client.add(
                 messages=[{"role": "system", "content": memory_content}],
@@ -463,19 +666,19 @@ class StoryMemoryManager:
                     "memory_type": MemoryType.INTERACTION_HISTORY.value,
                     "story_id": story_id,
                     "chapter_id": chapter_id,
-                    "interaction_data": interaction_data,
-                    "created_at": datetime.now().isoformat(),
+                    "interaction_data": _dumps_payload(interaction_data),
+                    "created_at": _iso_now(),
                     "importance_score": 0.4,
                 },
             )
 
             memory_id = result.get("id", f"interaction_{chapter_id}_{int(time.time())}")
 
-            logger.info(f"存储互动历史: {memory_id}")
+            logger.debug("存储互动历史: %s", memory_id)
             return memory_id
 
         except Exception as e:
-            logger.error(f"存储互动历史失败: {e}")
+            logger.error("存储互动历史失败: %s", e)
             return f"error_{int(time.time())}"
 
     def search_relevant_memories(
@@ -504,7 +707,13 @@ class StoryMemoryManager:
 
         try:
             # 检查缓存
-            cache_key = f"{user_id}_{query}_{story_id or 'all'}"
+            cache_key = _search_key(
+                user_id,
+                query,
+                story_id,
+                tuple(t.value for t in memory_types or ()),
+                limit,
+            )
             cached_result = self._get_from_cache(cache_key)
             if cached_result:
                 self.performance_stats["cache_hits"] += 1
@@ -514,26 +723,40 @@ class StoryMemoryManager:
                 logger.warning("Mem0客户端不可用，返回空搜索结果")
                 return []
 
-            # 构建搜索过滤器
-            filters = {"user_id": user_id}
-            if story_id:
-                filters["story_id"] = story_id
-            if memory_types:
-                # mem0不支持多个memory_type过滤，使用第一个
-                if len(memory_types) > 0:
+            vector_store = getattr(self.memory_client, "vector_store", None)
+            qdrant = getattr(vector_store, "client", None)
+            if qdrant is not None:
+                # 直接检索Qdrant，memory_types通过MatchAny一次过滤多个类型
+                hits = qdrant.query_points(
+                    collection_name=vector_store.collection_name,
+                    query=self.memory_client.embedding_model.embed(query, "search"),
+                    query_filter=self._qdrant_filter(user_id, story_id, memory_types),
+                    search_params=self._qdrant_search_params,
+                    limit=limit,
+                    with_payload=True,
+                ).points
+                memories = [self._hit_to_memory_result(hit) for hit in hits]
+            else:
+                # 构建搜索过滤器
+                filters = {"user_id": user_id}
+                if story_id:
+                    filters["story_id"] = story_id
+                if memory_types:
+                    # mem0不支持多个memory_type过滤，使用第一个
                     filters["memory_type"] = memory_types[0].value
 
-            # 执行搜索
-            search_results = self.memory_client.search(
-                query=query, user_id=user_id, limit=limit, filters=filters
-            )
+                # 执行搜索
+                search_results = self.memory_client.search(
+                    query=query, user_id=user_id, limit=limit, filters=filters
+                )
 
-            # 处理搜索结果
-            memories = []
-            if isinstance(search_results, dict) and "results" in search_results:
-                for result in search_results["results"]:
-                    memory = self._convert_to_memory_result(result)
-                    memories.append(memory)
+                # 处理搜索结果
+                raw_results = (
+                    search_results.get("results", [])
+                    if isinstance(search_results, dict)
+                    else []
+                )
+                memories = [self._convert_to_memory_result(r) for r in raw_results]
 
             # 更新缓存
             self._update_cache(cache_key, memories)
@@ -547,14 +770,32 @@ class StoryMemoryManager:
             ) / self.performance_stats["total_searches"]
 
             logger.debug(
-                f"记忆搜索完成: {len(memories)}个结果, 耗时{search_time:.3f}秒"
+                "记忆搜索完成: %d个结果, 耗时%.3f秒", len(memories), search_time
             )
             return memories
 
         except Exception as e:
-            logger.error(f"记忆搜索失败: {e}")
+            logger.error("记忆搜索失败: %s", e)
             return []
 
+    async def asearch_relevant_memories(
+        self,
+        query: str,
+        user_id: str,
+        story_id: Optional[str] = None,
+        memory_types: Optional[List[MemoryType]] = None,
+        limit: int = 5,
+    ) -> List[MemorySearchResult]:
+        """search_relevant_memories的异步版本，在线程中执行阻塞的mem0检索"""
+        return await asyncio.to_thread(
+            self.search_relevant_memories,
+            query=query,
+            user_id=user_id,
+            story_id=story_id,
+            memory_types=memory_types,
+            limit=limit,
+        )
+
     def _convert_to_memory_result(
         self, raw_result: Dict[str, Any]
     ) -> MemorySearchResult:
@@ -574,24 +815,16 @@ class StoryMemoryManager:
                     story_id=metadata.get("story_id"),
                     chapter_id=metadata.get("chapter_id"),
                     role_id=metadata.get("role_id"),
-                    created_at=datetime.fromisoformat(
-                        metadata.get("created_at", datetime.now().isoformat())
-                    ),
+                    created_at=metadata.get("created_at") or _iso_now(),
                     importance_score=metadata.get("importance_score", 0.5),
                     access_count=metadata.get("access_count", 0),
-                    last_accessed=(
-                        datetime.fromisoformat(
-                            metadata.get("last_accessed", datetime.now().isoformat())
-                        )
-                        if metadata.get("last_accessed")
-                        else None
-                    ),
+                    last_accessed=metadata.get("last_accessed") or None,
                 ),
                 relevance_score=raw_result.get("score", 0.0),
                 context_summary=raw_result.get("context_summary"),
             )
         except Exception as e:
-            logger.error(f"转换记忆结果失败: {e}")
+            logger.error("转换记忆结果失败: %s", e)
             # 返回默认结果
             return MemorySearchResult(
                 memory_id=raw_result.get("id", "error"),
@@ -605,7 +838,219 @@ class StoryMemoryManager:
                 relevance_score=0.0,
             )
 
-    def get_story_context(
+    @staticmethod
+    def _story_context_queries(story_id: str) -> Tuple[str, str, str]:
+        """故事上下文使用的三条固定查询"""
+        return (
+            f"故事 {story_id} 世界观设定",
+            f"故事 {story_id} 角色信息",
+            f"故事 {story_id} 进度",
+        )
+
+    def _get_context_query_embeddings(self, story_id: str) -> List[List[float]]:
+        """获取故事上下文查询向量，每个故事只计算一次"""
+        vectors = self._ctx_query_embeddings.get(story_id)
+        if vectors is None:
+            embedder = self.memory_client.embedding_model
+            vectors = [
+                embedder.embed(query, "search")
+                for query in self._story_context_queries(story_id)
+            ]
+            if len(self._ctx_query_embeddings) >= self.CACHE_MAX_SIZE:
+                # 淘汰最早写入的故事
+                self._ctx_query_embeddings.pop(next(iter(self._ctx_query_embeddings)))
+            self._ctx_query_embeddings[story_id] = vectors
+        return vectors
+
+    def _qdrant_filter(
+        self,
+        user_id: str,
+        story_id: Optional[str] = None,
+        memory_types: Optional[List[MemoryType]] = None,
+    ) -> Any:
+        """构建Qdrant过滤条件，多个记忆类型按任一匹配"""
+        from qdrant_client import models
+
+        conditions = [
+            models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id))
+        ]
+        if story_id:
+            conditions.append(
+                models.FieldCondition(
+                    key="story_id", match=models.MatchValue(value=story_id)
+                )
+            )
+        if memory_types:
+            conditions.append(
+                models.FieldCondition(
+                    key="memory_type",
+                    match=models.MatchAny(any=[t.value for t in memory_types]),
+                )
+            )
+        return models.Filter(must=conditions)
+
+    @functools.cached_property
+    def _qdrant_search_params(self) -> Any:
+        """
+        Qdrant检索参数（首次使用时确定）
+
+        集合启用了量化时先用量化向量取2倍候选，再用原始向量重新打分，保持召回率。
+        本地模式为精确暴力搜索，未启用量化的集合也无需重新打分，均返回None。
+        """
+        vector_store = getattr(self.memory_client, "vector_store", None)
+        qdrant = getattr(vector_store, "client", None)
+        if qdrant is None or _is_local_qdrant(qdrant):
+            return None
+
+        try:
+            collection = qdrant.get_collection(vector_store.collection_name)
+        except Exception as e:
+            logger.warning("读取Qdrant集合配置失败，检索不重新打分: %s", e)
+            return None
+        if collection.config.quantization_config is None:
+            return None
+
+        from qdrant_client import models
+
+        return models.SearchParams(
+            quantization=models.QuantizationSearchParams(
+                ignore=False, rescore=True, oversampling=2.0
+            )
+        )
+
+    def _hit_to_memory_result(self, hit: Any) -> MemorySearchResult:
+        """将Qdrant检索命中转换为标准格式（payload中data字段为记忆内容）"""
+        payload = dict(hit.payload or {})
+        return self._convert_to_memory_result(
+            {
+                "id": hit.id,
+                "memory": payload.pop("data", ""),
+                "score": hit.score,
+                "metadata": payload,
+            }
+        )
+
+    def search_relevant_memories_batch(
+        self,
+        specs: List[SearchSpec],
+        vectors: Optional[List[List[float]]] = None,
+    ) -> List[List[MemorySearchResult]]:
+        """
+        批量搜索相关记忆
+
+        未命中缓存的查询通过一次Qdrant query_batch_points请求完成检索。
+
+        Args:
+            specs: 检索条件列表
+            vectors: 与specs一一对应的查询向量（可选），未提供时调用嵌入模型计算
+
+        Returns:
+            与specs顺序一致的搜索结果列表
+        """
+        vector_store = getattr(self.memory_client, "vector_store", None)
+        qdrant = getattr(vector_store, "client", None)
+        if qdrant is None:
+            return [self.search_relevant_memories(**spec) for spec in specs]
+
+        self.performance_stats["total_searches"] += len(specs)
+        results: List[List[MemorySearchResult]] = [[] for _ in specs]
+
+        try:
+            from qdrant_client import models
+
+            pending = []
+            for i, spec in enumerate(specs):
+                memory_types = spec.get("memory_types")
+                cache_key = _search_key(
+                    spec["user_id"],
+                    spec["query"],
+                    spec.get("story_id"),
+                    tuple(t.value for t in memory_types or ()),
+                    spec.get("limit", 5),
+                )
+                cached_result = self._get_from_cache(cache_key)
+                if cached_result:
+                    self.performance_stats["cache_hits"] += 1
+                    results[i] = cached_result
+                else:
+                    pending.append((i, cache_key))
+
+            if not pending:
+                return results
+
+            embedder = self.memory_client.embedding_model
+            search_params = self._qdrant_search_params
+            requests = [
+                models.QueryRequest(
+                    query=(
+                        vectors[i]
+                        if vectors is not None
+                        else embedder.embed(specs[i]["query"], "search")
+                    ),
+                    filter=self._qdrant_filter(
+                        specs[i]["user_id"],
+                        specs[i].get("story_id"),
+                        specs[i].get("memory_types"),
+                    ),
+                    params=search_params,
+                    limit=specs[i].get("limit", 5),
+                    with_payload=True,
+                )
+                for i, _ in pending
+            ]
+            batch_responses = qdrant.query_batch_points(
+                collection_name=vector_store.collection_name, requests=requests
+            )
+
+            for (i, cache_key), response in zip(pending, batch_responses):
+                memories = [self._hit_to_memory_result(hit) for hit in response.points]
+                self._update_cache(cache_key, memories)
+                results[i] = memories
+
+            return results
+
+        except Exception as e:
+            logger.error("批量记忆搜索失败: %s", e)
+            return results
+
+    async def _search_story_context(
+        self, user_id: str, story_id: str
+    ) -> List[List[MemorySearchResult]]:
+        """获取故事上下文的三类记忆，可直接访问Qdrant时合并为一次批量检索"""
+        queries = self._story_context_queries(story_id)
+        specs: List[SearchSpec] = [
+            {
+                "query": query,
+                "user_id": user_id,
+                "story_id": story_id,
+                "memory_types": [memory_type],
+                "limit": limit,
+            }
+            for query, (memory_type, limit) in zip(
+                queries,
+                (
+                    (MemoryType.WORLD_SETTING, 3),
+                    (MemoryType.CHARACTER_INFO, 5),
+                    (MemoryType.STORY_PROGRESS, 3),
+                ),
+            )
+        ]
+
+        vector_store = getattr(self.memory_client, "vector_store", None)
+        if getattr(vector_store, "client", None) is None:
+            # 无法直接访问Qdrant时，三次mem0检索在线程中并发执行
+            return list(
+                await asyncio.gather(
+                    *(self.asearch_relevant_memories(**spec) for spec in specs)
+                )
+            )
+
+        vectors = await asyncio.to_thread(self._get_context_query_embeddings, story_id)
+        return await asyncio.to_thread(
+            self.search_relevant_memories_batch, specs, vectors
+        )
+
+    async def get_story_context(
         self, user_id: str, story_id: str, chapter_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
@@ -620,29 +1065,9 @@ class StoryMemoryManager:
             故事上下文字典
         """
         try:
-            # 搜索相关记忆
-            world_memories = self.search_relevant_memories(
-                query=f"故事 {story_id} 世界观设定",
-                user_id=user_id,
-                story_id=story_id,
-                memory_types=[MemoryType.WORLD_SETTING],
-                limit=3,
-            )
-
-            role_memories = self.search_relevant_memories(
-                query=f"故事 {story_id} 角色信息",
-                user_id=user_id,
-                story_id=story_id,
-                memory_types=[MemoryType.CHARACTER_INFO],
-                limit=5,
-            )
-
-            progress_memories = self.search_relevant_memories(
-                query=f"故事 {story_id} 进度",
-                user_id=user_id,
-                story_id=story_id,
-                memory_types=[MemoryType.STORY_PROGRESS],
-                limit=3,
+            # 一次批量检索三类相关记忆，查询向量按故事缓存
+            world_memories, role_memories, progress_memories = (
+                await self._search_story_context(user_id, story_id)
             )
 
             # 构建上下文
@@ -666,7 +1091,7 @@ class StoryMemoryManager:
             return context
 
         except Exception as e:
-            logger.error(f"获取故事上下文失败: {e}")
+            logger.error("获取故事上下文失败: %s", e)
             return {"story_id": story_id, "user_id": user_id, "error": str(e)}
 
     def update_user_preferences(
@@ -684,7 +1109,7 @@ class StoryMemoryManager:
 - 偏好类型: {preferences.get('type', '')}
 - 偏好内容: {preferences.get('content', '')}
 - 偏好值: {preferences.get('value', '')}
-- 更新时间: {datetime.now().isoformat()}
+- 更新时间: {_iso_now()}
             """
 
             self.memory_client.add(
@@ -693,16 +1118,16 @@ class StoryMemoryManager:
                 metadata={
                     "memory_type": MemoryType.USER_PREFERENCE.value,
                     "preferences": preferences,
-                    "created_at": datetime.now().isoformat(),
+                    "created_at": _iso_now(),
                     "importance_score": 0.7,
                 },
             )
 
-            logger.info(f"更新用户偏好: {user_id}")
+            logger.info("更新用户偏好: %s", user_id)
             return True
 
         except Exception as e:
-            logger.error(f"更新用户偏好失败: {e}")
+            logger.error("更新用户偏好失败: %s", e)
             return False
 
     def get_user_preferences(self, user_id: str) -> Dict[str, Any]:
@@ -726,7 +1151,7 @@ class StoryMemoryManager:
             return preferences
 
         except Exception as e:
-            logger.error(f"获取用户偏好失败: {e}")
+            logger.error("获取用户偏好失败: %s", e)
             return {}
 
     def cleanup_expired_memories(self, days_threshold: int = 30) -> int:
@@ -734,11 +1159,11 @@ class StoryMemoryManager:
         try:
             # 这里需要根据mem0的实际API来实现
             # 目前返回模拟结果
-            logger.info(f"清理 {days_threshold} 天前的过期记忆")
+            logger.info("清理 %s 天前的过期记忆", days_threshold)
             return 0  # 返回清理的记忆数量
 
         except Exception as e:
-            logger.error(f"清理过期记忆失败: {e}")
+            logger.error("清理过期记忆失败: %s", e)
             return 0
 
     def get_memory_statistics(self, user_id: Optional[str] = None) -> Dict[str, Any]:
@@ -753,37 +1178,70 @@ class StoryMemoryManager:
 
             if user_id:
                 # 获取特定用户的记忆统计
-                user_stats = {}
-                for memory_type in MemoryType:
-                    memories = self.search_relevant_memories(
-                        query="", user_id=user_id, memory_types=[memory_type], limit=100
-                    )
-                    user_stats[memory_type.value] = len(memories)
-
-                stats["user_memories"][user_id] = user_stats
+                stats["user_memories"][user_id] = self._count_user_memories(user_id)
 
             return stats
 
         except Exception as e:
-            logger.error(f"获取记忆统计失败: {e}")
+            logger.error("获取记忆统计失败: %s", e)
             return {"error": str(e)}
 
-    def _update_cache(self, key: str, data: Any) -> None:
+    def _count_user_memories(self, user_id: str) -> Dict[str, int]:
+        """
+        按记忆类型统计用户的记忆数量
+
+        每种类型调用一次Qdrant count接口，只在服务端计数，不返回记忆内容，
+        也不需要为每种类型执行一次语义检索。
+        """
+        vector_store = getattr(self.memory_client, "vector_store", None)
+        qdrant = getattr(vector_store, "client", None)
+        if qdrant is None:
+            return {memory_type.value: 0 for memory_type in MemoryType}
+
+        return {
+            memory_type.value: qdrant.count(
+                collection_name=vector_store.collection_name,
+                count_filter=self._qdrant_filter(user_id, memory_types=[memory_type]),
+                exact=True,
+            ).count
+            for memory_type in MemoryType
+        }
+
+    def _update_cache(self, key: Union[str, int], data: Any) -> None:
         """更新缓存"""
-        self.memory_cache[key] = {"data": data, "timestamp": time.time()}
+        with self._cache_lock:
+            self.memory_cache[key] = (time.monotonic(), data)
+            self.memory_cache.move_to_end(key)
+            while len(self.memory_cache) > self.CACHE_MAX_SIZE:
+                self.memory_cache.popitem(last=False)
 
-    def _get_from_cache(self, key: str) -> Optional[Any]:
+    def _get_from_cache(self, key: Union[str, int]) -> Optional[Any]:
         """从缓存获取数据"""
-        cached_item = self.memory_cache.get(key)
-        if cached_item and time.time() - cached_item["timestamp"] < self.cache_ttl:
-            return cached_item["data"]
-        return None
+        with self._cache_lock:
+            cached_item = self.memory_cache.get(key)
+            if cached_item is None:
+                return None
+            if time.monotonic() - cached_item[0] >= self.cache_ttl:
+                del self.memory_cache[key]
+                return None
+            self.memory_cache.move_to_end(key)
+            return cached_item[1]
 
     def clear_cache(self) -> None:
         """清理缓存"""
-        self.memory_cache.clear()
+        with self._cache_lock:
+            self.memory_cache.clear()
         logger.info("记忆缓存已清理")
 
 
-# 创建全局记忆管理器实例
-story_memory_manager = StoryMemoryManager()
+@functools.cache
+def get_story_memory_manager() -> StoryMemoryManager:
+    """获取全局记忆管理器实例，首次调用时才初始化mem0客户端"""
+    return StoryMemoryManager()
+
+
+def __getattr__(name: str) -> Any:
+    # 兼容 `from core.memory.mem0 import story_memory_manager` 的旧写法
+    if name == "story_memory_manager":
+        return get_story_memory_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
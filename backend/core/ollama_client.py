@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 from typing import List, Dict, Any, Optional
@@ -26,6 +27,13 @@ class OllamaClient:
         self.base_url = getattr(settings, 'ollama_base_url', 'http://localhost:11434')
         self.default_model = getattr(settings, 'ollama_default_model', 'emotion_lora')
         self.timeout = getattr(settings, 'ollama_timeout', 60)
+
+        # 复用同一个会话的连接池，避免每次请求重新建立TCP连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
         self._initialized = True
     
     def _make_request(self, endpoint: str, method: str = 'GET', data: Optional[Dict] = None) -> Dict[str, Any]:
@@ -41,13 +49,12 @@ class OllamaClient:
             响应数据
         """
         url = f"{self.base_url}{endpoint}"
-        headers = {'Content-Type': 'application/json'}
         
         try:
             if method == 'GET':
-                response = requests.get(url, timeout=self.timeout)
+                response = self.session.get(url, timeout=self.timeout)
             elif method == 'POST':
-                response = requests.post(url, json=data, headers=headers, timeout=self.timeout)
+                response = self.session.post(url, json=data, timeout=self.timeout)
             else:
                 raise ValueError(f"不支持的HTTP方法: {method}")
             
@@ -157,23 +164,23 @@ class OllamaClient:
         流式聊天补全
         """
         url = f"{self.base_url}/api/generate"
-        headers = {'Content-Type': 'application/json'}
         
         try:
-            response = requests.post(url, json=data, headers=headers, stream=True, timeout=self.timeout)
-            response.raise_for_status()
-            
-            full_response = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        chunk = json.loads(line.decode('utf-8'))
-                        if 'response' in chunk:
-                            full_response += chunk['response']
-                        if chunk.get('done', False):
-                            break
-                    except json.JSONDecodeError:
-                        continue
+            # with块结束时释放连接，使其回到连接池
+            with self.session.post(url, json=data, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                
+                full_response = ""
+                for line in response.iter_lines():
+                    if line:
+                        try:
+                            chunk = json.loads(line.decode('utf-8'))
+                            if 'response' in chunk:
+                                full_response += chunk['response']
+                            if chunk.get('done', False):
+                                break
+                        except json.JSONDecodeError:
+                            continue
             
             return full_response
         except Exception as e:
@@ -0,0 +1,116 @@
+"""
+WebSocket连接管理模块
+
+每个设备连接对应一个发送队列和一个常驻写协程，
+send_personal_message 只负责入队，避免每条消息创建一个 Task。
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Any, Optional
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+
+class WebSocketManager:
+    """
+    WebSocket连接管理器
+
+    - connect: 登记设备连接并启动该连接的写协程
+    - send_personal_message: 将消息放入设备队列（非阻塞）
+    - disconnect: 停止写协程并移除连接
+    """
+
+    # 写协程每次唤醒后最多连续发送的消息数
+    MAX_BATCH_SIZE = 32
+
+    def __init__(self):
+        self.active_connections: Dict[str, WebSocket] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._writers: Dict[str, asyncio.Task] = {}
+
+    async def connect(self, websocket: WebSocket, device_id: str) -> None:
+        """登记设备连接，为其创建发送队列和写协程"""
+        # 同一设备重连时先清理旧连接
+        if device_id in self.active_connections:
+            await self.disconnect(device_id)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        self.active_connections[device_id] = websocket
+        self._queues[device_id] = queue
+        self._writers[device_id] = asyncio.create_task(
+            self._per_client_writer(device_id, websocket, queue)
+        )
+        logger.info(f"设备 {device_id} 已登记WebSocket连接")
+
+    async def disconnect(self, device_id: str, websocket: Optional[WebSocket] = None) -> None:
+        """
+        移除设备连接并停止其写协程
+
+        传入websocket时，只有该连接仍是设备当前登记的连接才会移除，
+        避免设备重连后旧连接的清理把新连接一并移除。
+        """
+        if websocket is not None and self.active_connections.get(device_id) is not websocket:
+            return
+        self.active_connections.pop(device_id, None)
+        self._queues.pop(device_id, None)
+        writer = self._writers.pop(device_id, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+            try:
+                await writer
+            except asyncio.CancelledError:
+                pass
+        logger.info(f"设备 {device_id} 的WebSocket连接已移除")
+
+    async def send_personal_message(self, message: Dict[str, Any], device_id: str) -> None:
+        """
+        向指定设备发送消息
+
+        消息在调用方序列化后放入设备队列，由写协程负责实际发送。
+
+        Raises:
+            KeyError: 设备未连接
+        """
+        queue = self._queues.get(device_id)
+        if queue is None:
+            raise KeyError(f"设备 {device_id} 未连接")
+        queue.put_nowait(json.dumps(message, ensure_ascii=False))
+
+    def is_connected(self, device_id: str) -> bool:
+        """设备是否已连接"""
+        return device_id in self.active_connections
+
+    async def _per_client_writer(
+        self, device_id: str, websocket: WebSocket, queue: asyncio.Queue
+    ) -> None:
+        """单个连接的常驻写协程：阻塞等待首条消息，随后把已排队的消息一并发出"""
+        try:
+            while True:
+                batch = [await queue.get()]
+                while len(batch) < self.MAX_BATCH_SIZE:
+                    try:
+                        batch.append(queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+
+                # 设备协议按帧解析单条JSON，因此逐条发送而不是合并为一帧
+                for payload in batch:
+                    await websocket.send_text(payload)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"设备 {device_id} 的WebSocket发送失败: {e}")
+            # 发送失败说明连接已不可用，清理登记信息
+            if self._writers.get(device_id) is asyncio.current_task():
+                self.active_connections.pop(device_id, None)
+                self._queues.pop(device_id, None)
+                self._writers.pop(device_id, None)
+
+
+# 全局WebSocket连接管理器实例
+websocket_manager = WebSocketManager()
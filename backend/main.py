@@ -3,6 +3,7 @@ import json
 import time
 from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from scalar_fastapi import get_scalar_api_reference
 import sys
 import os
@@ -32,16 +33,25 @@ else:
 
 # 导入路由
 from api.langgraph_routes import router as langgraph_router
+from core.websocket_manager import websocket_manager
 
 from config.settings import settings
 
+# orjson可选，未安装时回退到标准库json响应
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
 app = FastAPI(
     title=settings.app_name,
     description=settings.app_description,
     version=settings.app_version,
     openapi_url="/openapi.json",
     docs_url=None,
-    redoc_url=None
+    redoc_url=None,
+    default_response_class=DefaultResponse,
 )
 
 # 设置全局异常处理
@@ -141,6 +151,7 @@ async def websocket_endpoint(websocket: WebSocket):
 
     audio_session_id = None
     status = None
+    device_id = None
 
     try:
         # 保持连接并处理后续消息 - 智能分发
@@ -158,6 +169,8 @@ async def websocket_endpoint(websocket: WebSocket):
                 if isinstance(message_data, str):
                     # 智能分发：文本消息 -> 文本处理
                     status = await _handle_text_message(message_data, websocket)
+                    if status and status.get("device_id"):
+                        device_id = status["device_id"]
                     print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>", message_data)
   
                 elif isinstance(message_data, bytes):
@@ -178,6 +191,8 @@ async def websocket_endpoint(websocket: WebSocket):
     finally:
         
         # 清理资源
+        if device_id:
+            await websocket_manager.disconnect(device_id, websocket)
             
         # if audio_session_id != "Session_Audio_Unknown" and audio_session_id:
             # audio_manager.end_session(audio_session_id) 
@@ -7,6 +7,8 @@ LangGraph Routes 真实接口测试运行器
 
 import sys
 import argparse
+import functools
+import importlib.util
 import subprocess
 import os
 import time
@@ -62,6 +64,12 @@ def run_tests(args):
         return 1
 
 
+@functools.lru_cache(maxsize=None)
+def _is_installed(package: str) -> bool:
+    """只查找模块规格，不执行包的导入代码"""
+    return importlib.util.find_spec(package) is not None
+
+
 def check_dependencies():
     """检查依赖"""
     required_packages = [
@@ -71,12 +79,7 @@ def check_dependencies():
         "pydantic"
     ]
 
-    missing = []
-    for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
-            missing.append(package)
+    missing = [package for package in required_packages if not _is_installed(package)]
 
     if missing:
         print(f"错误: 缺少依赖包: {', '.join(missing)}")
@@ -98,6 +101,7 @@ def main():
   %(prog)s --class TestChatReal        # 只运行聊天测试
   %(prog)s --coverage                   # 生成覆盖率报告
   %(prog)s --slow                       # 跳过慢速测试
+  %(prog)s --smoke                      # 先检查API应用能否加载
         """
     )
 
@@ -142,6 +146,12 @@ def main():
         help="列出所有可用的测试"
     )
 
+    parser.add_argument(
+        "--smoke",
+        action="store_true",
+        help="运行测试前先在当前进程加载API应用进行检查"
+    )
+
     args = parser.parse_args()
 
     if args.check_deps:
@@ -167,14 +177,15 @@ def main():
         print(f"错误: 测试文件不存在: {test_file}")
         return 1
 
-    # 检查API服务是否可用
-    print("检查API服务...")
-    try:
-        from main import app
-        print("✅ API应用加载成功")
-    except Exception as e:
-        print(f"❌ API应用加载失败: {e}")
-        return 1
+    # 检查API服务是否可用（pytest子进程会再次导入应用，默认跳过）
+    if args.smoke:
+        print("检查API服务...")
+        try:
+            from main import app
+            print("✅ API应用加载成功")
+        except Exception as e:
+            print(f"❌ API应用加载失败: {e}")
+            return 1
 
     # 运行测试
     return run_tests(args)
@@ -0,0 +1,54 @@
+"""
+测试公共配置
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def settings():
+    """整个测试会话共用的配置实例"""
+    from config.settings import get_settings
+    return get_settings()
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--real-llm",
+        action="store_true",
+        default=False,
+        help="运行标记为 real_llm 的测试（需要可用的Ollama服务）",
+    )
+
+
+def pytest_configure(config):
+    """
+    本地运行时不写入 .pytest_cache
+
+    只在 CI 上保留上次失败/新增用例的缓存记录；本地显式使用 --lf/--ff/--nf 时仍然保留。
+    """
+    if os.environ.get("CI") or not config.pluginmanager.hasplugin("cacheprovider"):
+        return
+    if any(config.getoption(name, default=False) for name in ("lf", "failedfirst", "newfirst")):
+        return
+    for name in ("lfplugin", "nfplugin"):
+        plugin = config.pluginmanager.get_plugin(name)
+        if plugin is not None:
+            config.pluginmanager.unregister(plugin)
+
+
+def pytest_collection_modifyitems(config, items):
+    """未指定 --real-llm 时跳过依赖真实LLM回复的测试"""
+    if config.getoption("--real-llm"):
+        return
+    skip_real_llm = pytest.mark.skip(reason="需要 --real-llm 才会运行")
+    for item in items:
+        if "real_llm" in item.keywords:
+            item.add_marker(skip_real_llm)
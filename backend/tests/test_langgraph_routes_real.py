@@ -1,47 +1,75 @@
 """
 LangGraph Routes 真实接口测试
 
-使用真实的API端点和数据库进行集成测试，不使用Mock对象
+使用真实的API端点和测试数据库进行集成测试。
+Ollama请求默认替换为固定回复，只有标记为 real_llm 的测试调用真实服务。
 """
 
 import pytest
+import pytest_asyncio
+import httpx
 import json
+import re
 import asyncio
-import sys
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool
 
-# 添加项目根目录到Python路径
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# orjson可选，未安装时回退到response.json()
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 导入应用和数据库
 from main import app
+from core.ollama_client import OllamaClient
 from utils.db.database import Base, get_db
-from utils.db.database_service import DatabaseService
 from models.user import User, Session, Conversation
 from schemas.chat import ChatRequest
-from schemas.session import SessionCreateRequest
 
-# 创建测试数据库
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# 创建测试数据库：共享缓存的内存库，保活连接、建表和各测试的事务连接访问同一份数据。
+# 接口请求都复用db夹具的会话（见override_get_db），不会并发访问数据库；
+# 使用QueuePool是因为内存库默认的SingletonThreadPool在同一线程只给出一个连接，
+# 测试事务会与保活连接共用同一连接。
+# pytest-xdist 下每个worker使用独立命名的内存库，worker之间互不共享，各自只建表一次
+WORKER_ID = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///file:testdb_{WORKER_ID}?mode=memory&cache=shared&uri=true"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+    poolclass=QueuePool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# 测试客户端将在类的setup_class方法中初始化
+
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_transaction(dbapi_connection, connection_record):
+    """关闭pysqlite自带的事务处理，由SQLAlchemy发出BEGIN，使SAVEPOINT正常工作"""
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+# 当前测试的数据库会话，由db夹具设置。
+# TestClient在独立线程中运行应用，ContextVar无法传递到请求中，因此使用模块级变量
+_test_session = None
 
 
 def override_get_db():
-    """覆盖数据库依赖以使用测试数据库"""
+    """覆盖数据库依赖，测试期间直接复用db夹具的会话，接口中的提交只作用于SAVEPOINT"""
+    if _test_session is not None:
+        yield _test_session
+        return
+    db = TestingSessionLocal()
     try:
-        db = TestingSessionLocal()
         yield db
     finally:
         db.close()
@@ -50,225 +78,266 @@ def override_get_db():
 app.dependency_overrides[get_db] = override_get_db
 
 
-@pytest.fixture(scope="function")
-def db():
-    """创建测试数据库会话"""
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-        Base.metadata.drop_all(bind=engine)
+@pytest.fixture(scope="session")
+def canned_ollama_responses(settings):
+    """默认用于替代Ollama的固定回复，按API端点区分"""
+    return {
+        "/api/tags": {"models": [{"name": settings.ollama_default_model}]},
+        "/api/generate": {"response": "这是一个测试回复。", "done": True},
+        "/api/chat": {"message": {"role": "assistant", "content": "这是一个测试回复。"}, "done": True},
+    }
 
 
-@pytest.fixture(scope="function")
-def test_user(db):
-    """创建测试用户"""
-    user = User(id=1, username="testuser", email="test@example.com")
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
-
-
-@pytest.fixture(scope="function")
-def test_session(db, test_user):
-    """创建测试会话"""
-    session = Session(
-        id=1,
-        user_id=test_user.id,
-        title="测试会话",
-        is_active=1
-    )
-    db.add(session)
-    db.commit()
-    db.refresh(session)
-    return session
+@pytest.fixture(scope="session")
+def ollama_available(settings):
+    """整个测试会话只探测一次Ollama服务是否可用，只有real_llm测试会触发探测"""
+    try:
+        httpx.get(f"{settings.ollama_base_url}/api/tags", timeout=1.0).raise_for_status()
+        return True
+    except httpx.HTTPError:
+        return False
 
 
-class TestLangGraphChatReal:
-    """测试真实的 /api/langgraph/chat 端点"""
+@pytest.fixture(autouse=True)
+def mock_ollama(request, monkeypatch, canned_ollama_responses):
+    """
+    默认替换Ollama请求为固定回复，测试只衡量框架本身的开销
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
+    标记为 real_llm 的测试保留真实调用，Ollama不可用时直接跳过，不再逐个等待请求超时。
+    """
+    if request.node.get_closest_marker("real_llm") is not None:
+        if not request.getfixturevalue("ollama_available"):
+            pytest.skip("Ollama服务不可用")
+        return
 
-    def test_chat_success_simple(self, test_user):
-        """测试简单聊天成功"""
-        request_data = {
-            "content": "你好",
-            "user_id": test_user.id,
-            "session_id": None
-        }
+    def _canned_request(self, endpoint, method="GET", data=None):
+        return canned_ollama_responses.get(endpoint, {})
 
-        response = self.client.post("/api/langgraph/chat", json=request_data)
+    monkeypatch.setattr(OllamaClient, "_make_request", _canned_request)
 
-        # 允许500错误（当Ollama不可用时），但系统应该仍然返回结构化响应
-        if response.status_code == 500:
-            print("聊天系统返回500错误（Ollama不可用），但系统正常处理错误")
-            return  # 测试通过，因为系统正确处理了外部服务不可用的情况
 
-        assert response.status_code == 200
+@pytest.fixture(scope="session")
+def _schema():
+    """整个测试会话只建表一次，并写入基础用户和会话"""
+    # 共享缓存内存库在最后一个连接关闭时销毁，测试期间保持一个连接打开
+    keepalive = engine.connect()
+    Base.metadata.create_all(bind=engine)
+    seed = TestingSessionLocal(expire_on_commit=False)
+    user = User(id=1, username="testuser", email="test@example.com")
+    session = Session(id=1, user_id=user.id, title="测试会话", is_active=1)
+    seed.add_all([user, session])
+    seed.commit()
+    seed.close()
 
-        data = response.json()
-        assert "response" in data
-        assert "agent_type" in data
-        assert "timestamp" in data
-        assert isinstance(data["response"], str)
-        assert len(data["response"]) > 0
-        print(f"聊天响应: {data['response']}")
+    # 测试中只读取字段，返回普通对象，避免ORM实例的过期刷新和跨测试状态
+    user = SimpleNamespace(id=user.id, username=user.username, email=user.email)
+    session = SimpleNamespace(id=session.id, user_id=session.user_id, title=session.title)
 
-    def test_chat_with_session(self, test_user, test_session):
-        """测试带会话ID的聊天"""
-        request_data = {
-            "content": "继续我们的话题",
-            "user_id": test_user.id,
-            "session_id": test_session.id
-        }
+    try:
+        yield user, session
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        keepalive.close()
 
-        response = self.client.post("/api/langgraph/chat", json=request_data)
 
-        # 允许500错误
-        if response.status_code == 500:
-            print("带会话聊天返回500错误（Ollama不可用），但系统正常处理错误")
-            return
+@pytest.fixture(scope="function", autouse=True)
+def db(_schema):
+    """每个测试在独立事务中运行，结束后回滚"""
+    global _test_session
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    _test_session = db
+    try:
+        yield db
+    finally:
+        _test_session = None
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+# 教育类回复应命中的关键词，预编译为单个正则，一次扫描即可判断
+_EDU_KEYWORDS = re.compile("太阳|行星|地球|星星")
+
+
+# 聊天请求模板，只需替换变化的字段
+_CHAT_TEMPLATE = ChatRequest(content="").model_dump()
+
+
+def _chat_payload(content, user_id, session_id=None):
+    """基于模板构建聊天请求体"""
+    return {**_CHAT_TEMPLATE, "content": content, "user_id": user_id, "session_id": session_id}
+
+
+def jloads(response):
+    """解析响应JSON"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def aclient():
+    """整个测试会话共用一个直接通过ASGI调用应用的异步客户端"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+
+async def _post_chats(ac, user_id, session_id, contents):
+    """
+    按顺序发送多条聊天请求，返回与contents顺序一致的响应列表
+
+    同一会话的多轮对话依赖前一轮的结果，且请求共用db夹具的会话，不能并发发送。
+    """
+    responses = []
+    for content in contents:
+        responses.append(await ac.post("/api/langgraph/chat", json=_chat_payload(content, user_id, session_id)))
+    return responses
+
+
+def seed_conversations(db, user_id, session_id, conversations):
+    """
+    直接写入对话记录，跳过聊天接口和LLM调用
+
+    conversations 为 (用户输入, 代理类型) 列表，用于只关心数据统计的接口测试。
+    与聊天接口写入的结构一致：每个代理类型一条记录，各轮对话保存在 conversation_history 中。
+    批量插入后只提交一次，不逐行构造ORM对象。
+    """
+    now = datetime.now(timezone.utc)
+    rows = {}
+    for i, (content, agent_type) in enumerate(conversations):
+        row = rows.setdefault(agent_type, {
+            "user_id": user_id,
+            "session_id": session_id,
+            "agent_type": agent_type,
+            "conversation_history": [],
+            "created_at": now,
+            "updated_at": now,
+        })
+        row["conversation_history"].append({
+            "user_input": content,
+            "agent_response": json.dumps({
+                "response": f"回复: {content}",
+                "metadata": {"type": agent_type},
+                "safety_info": {"passed": True}
+            }, ensure_ascii=False),
+            # 按输入顺序递增，保证按时间排序后与输入顺序一致
+            "timestamp": (now + timedelta(microseconds=i)).isoformat(),
+        })
+    db.bulk_insert_mappings(Conversation, list(rows.values()))
+    db.commit()
 
-        assert response.status_code == 200
 
-        data = response.json()
-        assert "response" in data
-        assert isinstance(data["response"], str)
-        print(f"带会话聊天响应: {data['response']}")
+@pytest.fixture(scope="module")
+def client():
+    """整个模块共用一个测试客户端"""
+    with TestClient(app) as c:
+        yield c
 
-    def test_chat_educational_content(self, test_user):
-        """测试教育内容聊天"""
-        request_data = {
-            "content": "什么是太阳系？",
-            "user_id": test_user.id,
-            "session_id": None
-        }
 
-        response = self.client.post("/api/langgraph/chat", json=request_data)
+@pytest.fixture(scope="session")
+def test_user(_schema):
+    """测试用户"""
+    return _schema[0]
 
-        # 允许500错误（Ollama不可用）
-        if response.status_code == 500:
-            print("聊天系统返回500错误（Ollama不可用），但系统正常处理错误")
-            return
 
-        assert response.status_code == 200
+@pytest.fixture(scope="session")
+def test_session(_schema):
+    """测试会话"""
+    return _schema[1]
 
-        data = response.json()
-        assert "response" in data
-        # 教育内容应该包含相关信息
-        response_text = data["response"].lower()
-        assert any(keyword in response_text for keyword in ["太阳", "行星", "地球", "星星"])
-        print(f"教育内容响应: {data['response']}")
 
-    def test_chat_story_trigger(self, test_user):
-        """测试故事模式触发"""
-        request_data = {
-            "content": "给我讲一个故事吧",
-            "user_id": test_user.id,
-            "session_id": None
-        }
+@pytest.fixture
+def seeded_conversations(db, test_user, test_session):
+    """向测试用户的测试会话批量写入对话记录"""
+    def _seed(conversations):
+        seed_conversations(db, test_user.id, test_session.id, conversations)
+    return _seed
 
-        response = self.client.post("/api/langgraph/chat", json=request_data)
 
-        # 允许500错误（Ollama不可用）
-        if response.status_code == 500:
-            print("聊天系统返回500错误（Ollama不可用），但系统正常处理错误")
-            return
+class TestLangGraphChatReal:
+    """测试真实的 /api/langgraph/chat 端点"""
 
+    # (内容, 是否带会话, 响应应匹配的关键词正则)
+    @pytest.mark.parametrize("content,with_session,expect_pattern", [
+        pytest.param("你好", False, None, id="simple"),
+        pytest.param("继续我们的话题", True, None, id="with_session"),
+        pytest.param("什么是太阳系？", False, _EDU_KEYWORDS, id="educational",
+                     marks=pytest.mark.real_llm),
+        pytest.param("给我讲一个故事吧", False, None, id="story_trigger"),
+        pytest.param("测试" * 1000, False, None, id="long_content"),  # 4000字符
+        pytest.param("什么是光合作用？", False, None, id="education_question"),
+        pytest.param("我今天很开心", False, None, id="emotion"),
+        pytest.param("给我讲一个冒险故事", False, None, id="adventure_story"),
+        pytest.param("请解释人工智能的基本原理和应用", False, None, id="complex_question"),
+        pytest.param("今天天气真好，适合户外活动", False, None, id="chinese"),
+        pytest.param("Hello, how are you today?", False, None, id="english"),
+        pytest.param("Hello 世界，今天学了 science", False, None, id="mixed"),
+    ])
+    def test_chat_variants(self, client, test_user, test_session, content, with_session,
+                           expect_pattern):
+        """测试不同内容的聊天请求"""
+        session_id = test_session.id if with_session else None
+        request_data = _chat_payload(content, test_user.id, session_id)
+
+        response = client.post("/api/langgraph/chat", json=request_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "response" in data
         assert "agent_type" in data
-        print(f"故事模式响应: {data['response']}, 代理类型: {data['agent_type']}")
+        assert "timestamp" in data
+        assert isinstance(data["response"], str)
+        assert len(data["response"]) > 0
+        if expect_pattern is not None:
+            assert expect_pattern.search(data["response"].lower())
+        print(f"聊天响应 ({len(data['response'])} 字符), 代理类型: {data['agent_type']}")
 
-    def test_chat_invalid_request(self):
+    def test_chat_invalid_request(self, client):
         """测试无效请求"""
         # 缺少content字段
         request_data = {
             "user_id": 1
         }
 
-        response = self.client.post("/api/langgraph/chat", json=request_data)
+        response = client.post("/api/langgraph/chat", json=request_data)
         assert response.status_code == 422
 
-    def test_chat_empty_content(self, test_user):
+    def test_chat_empty_content(self, client, test_user):
         """测试空内容"""
-        request_data = {
-            "content": "",
-            "user_id": test_user.id
-        }
+        request_data = _chat_payload("", test_user.id)
 
-        response = self.client.post("/api/langgraph/chat", json=request_data)
+        response = client.post("/api/langgraph/chat", json=request_data)
         # 空内容应该被接受或给出明确错误
         assert response.status_code in [200, 422]
 
-    def test_chat_long_content(self, test_user):
-        """测试长内容"""
-        long_content = "测试" * 1000  # 4000字符
-
-        request_data = {
-            "content": long_content,
-            "user_id": test_user.id
-        }
-
-        response = self.client.post("/api/langgraph/chat", json=request_data)
-
-        # 允许500错误（Ollama不可用）
-        if response.status_code == 500:
-            print("聊天系统返回500错误（Ollama不可用），但系统正常处理错误")
-            return
-
-        assert response.status_code == 200
-
-        data = response.json()
-        assert "response" in data
-        print(f"长内容响应长度: {len(data['response'])}")
-
 
 class TestLangGraphStreamChatReal:
     """测试真实的 /api/langgraph/chat/stream 端点"""
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
-
-    def test_stream_chat_success(self, test_user):
+    def test_stream_chat_success(self, client, test_user):
         """测试流式聊天成功"""
-        request_data = {
-            "content": "流式测试消息",
-            "user_id": test_user.id
-        }
+        request_data = _chat_payload("流式测试消息", test_user.id)
 
-        response = self.client.post("/api/langgraph/chat/stream", json=request_data)
+        response = client.post("/api/langgraph/chat/stream", json=request_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "type" in data
         assert "data" in data
         assert "session_id" in data
         assert data["type"] == "complete"
         print(f"流式响应: {data}")
 
-    def test_stream_chat_with_session(self, test_user, test_session):
+    def test_stream_chat_with_session(self, client, test_user, test_session):
         """测试带会话的流式聊天"""
-        request_data = {
-            "content": "流式继续聊天",
-            "user_id": test_user.id,
-            "session_id": test_session.id
-        }
+        request_data = _chat_payload("流式继续聊天", test_user.id, test_session.id)
 
-        response = self.client.post("/api/langgraph/chat/stream", json=request_data)
+        response = client.post("/api/langgraph/chat/stream", json=request_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "type" in data
         assert data["session_id"] == str(test_session.id)
         print(f"带会话流式响应: {data}")
@@ -277,17 +346,12 @@ class TestLangGraphStreamChatReal:
 class TestWorkflowStateReal:
     """测试真实的 /api/langgraph/workflow/state 端点"""
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
-
-    def test_workflow_state_success(self):
+    def test_workflow_state_success(self, client):
         """测试获取工作流状态"""
-        response = self.client.get("/api/langgraph/workflow/state?user_id=test123")
+        response = client.get("/api/langgraph/workflow/state?user_id=test123")
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "workflow_info" in data
         assert "graph_structure" in data
         assert "current_session" in data
@@ -316,21 +380,16 @@ class TestWorkflowStateReal:
         print(f"节点数量: {len(graph_structure['nodes'])}")
         print(f"边数量: {len(graph_structure['edges'])}")
 
-    def test_workflow_state_missing_user_id(self):
+    def test_workflow_state_missing_user_id(self, client):
         """测试缺少用户ID参数"""
-        response = self.client.get("/api/langgraph/workflow/state")
+        response = client.get("/api/langgraph/workflow/state")
         assert response.status_code == 422
 
 
 class TestConversationFlowAnalyticsReal:
     """测试真实的 /api/langgraph/analytics/conversation-flow 端点"""
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
-
-    def test_conversation_flow_with_data(self, test_user, test_session):
+    def test_conversation_flow_with_data(self, client, seeded_conversations, test_user, test_session):
         """测试有数据的对话流分析"""
         # 先创建一些对话数据
         conversations_data = [
@@ -341,21 +400,13 @@ class TestConversationFlowAnalyticsReal:
             ("谢谢", "chat")
         ]
 
-        for content, agent_type in conversations_data:
-            # 通过真实API创建对话
-            request_data = {
-                "content": content,
-                "user_id": test_user.id,
-                "session_id": test_session.id
-            }
-            response = self.client.post("/api/langgraph/chat", json=request_data)
-            assert response.status_code == 200
+        seeded_conversations(conversations_data)
 
         # 现在获取分析数据
-        response = self.client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=7")
+        response = client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=7")
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "analysis_period" in data
         assert "total_conversations" in data
         assert "agent_usage" in data
@@ -373,49 +424,68 @@ class TestConversationFlowAnalyticsReal:
         print(f"代理使用情况: {data['agent_usage']}")
         print(f"最常用代理: {data['insights']['most_used_agent']}")
 
-    def test_conversation_flow_no_data(self, test_user):
+    def test_conversation_flow_filters_turns_by_window(self, client, db, test_user, test_session):
+        """测试分析期按每轮对话的时间计算：早期创建的记录中最近的轮次仍被统计，过期轮次被丢弃"""
+        now = datetime.now(timezone.utc)
+        old_turn = (now - timedelta(days=30)).isoformat()
+        db.add(Conversation(
+            user_id=test_user.id,
+            session_id=test_session.id,
+            agent_type="chat",
+            conversation_history=[
+                {"user_input": "很久以前", "agent_response": "{}", "timestamp": old_turn},
+                {"user_input": "今天", "agent_response": "{}", "timestamp": now.isoformat()},
+            ],
+            created_at=now - timedelta(days=30),
+            updated_at=now,
+        ))
+        db.commit()
+
+        response = client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=7")
+        assert response.status_code == 200
+
+        data = jloads(response)
+        assert data["total_conversations"] == 1
+        assert data["conversation_flow"][0]["content_preview"].startswith("今天")
+
+    def test_conversation_flow_no_data(self, client, test_user):
         """测试没有对话数据的分析"""
-        response = self.client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=7")
+        response = client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=7")
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert data["total_conversations"] == 0
         assert data["agent_usage"] == {}
         assert data["insights"]["most_used_agent"] is None
 
-    def test_conversation_flow_invalid_days(self, test_user):
+    def test_conversation_flow_invalid_days(self, client, test_user):
         """测试无效的天数参数"""
-        response = self.client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=400")
+        response = client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=400")
         assert response.status_code == 422  # 超过最大值限制
 
-        response = self.client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=0")
+        response = client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=0")
         assert response.status_code == 422  # 小于最小值限制
 
-    def test_conversation_flow_missing_user_id(self):
+    def test_conversation_flow_missing_user_id(self, client):
         """测试缺少用户ID参数"""
-        response = self.client.get("/api/langgraph/analytics/conversation-flow?days=7")
+        response = client.get("/api/langgraph/analytics/conversation-flow?days=7")
         assert response.status_code == 422
 
 
 class TestSessionCreateReal:
     """测试真实的 /api/langgraph/session/create 端点"""
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
-
-    def test_session_create_success(self, test_user):
+    def test_session_create_success(self, client, test_user):
         """测试成功创建会话"""
         request_data = {
             "user_id": test_user.id,
             "title": "新测试会话"
         }
 
-        response = self.client.post("/api/langgraph/session/create", json=request_data)
+        response = client.post("/api/langgraph/session/create", json=request_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "id" in data
         assert "user_id" in data
         assert "title" in data
@@ -430,54 +500,42 @@ class TestSessionCreateReal:
 
         print(f"创建会话成功: ID={data['id']}, 标题='{data['title']}'")
 
-    def test_session_create_with_none_title(self, test_user):
+    def test_session_create_with_none_title(self, client, test_user):
         """测试标题为None时使用默认值"""
         request_data = {
             "user_id": test_user.id,
             "title": None
         }
 
-        response = self.client.post("/api/langgraph/session/create", json=request_data)
+        response = client.post("/api/langgraph/session/create", json=request_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert data["title"] == "新会话"  # 默认标题
 
-    def test_session_create_missing_user_id(self):
+    def test_session_create_missing_user_id(self, client):
         """测试缺少用户ID"""
         request_data = {
             "title": "测试会话"
         }
 
-        response = self.client.post("/api/langgraph/session/create", json=request_data)
+        response = client.post("/api/langgraph/session/create", json=request_data)
         assert response.status_code == 422
 
 
 class TestSessionHistoryReal:
     """测试真实的 /api/langgraph/session/{session_id}/history 端点"""
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
-
-    def test_session_history_with_data(self, test_user, test_session):
+    def test_session_history_with_data(self, client, seeded_conversations, test_user, test_session):
         """测试有数据的会话历史"""
         # 先添加一些对话
-        for i in range(3):
-            request_data = {
-                "content": f"测试消息 {i+1}",
-                "user_id": test_user.id,
-                "session_id": test_session.id
-            }
-            response = self.client.post("/api/langgraph/chat", json=request_data)
-            assert response.status_code == 200
+        seeded_conversations([(f"测试消息 {i+1}", "chat") for i in range(3)])
 
         # 获取历史记录
-        response = self.client.get(f"/api/langgraph/session/{test_session.id}/history")
+        response = client.get(f"/api/langgraph/session/{test_session.id}/history")
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "session_id" in data
         assert "total_conversations" in data
         assert "history" in data
@@ -498,48 +556,53 @@ class TestSessionHistoryReal:
 
         print(f"会话历史: 总对话数 {data['total_conversations']}")
 
-    def test_session_history_with_limit(self, test_user, test_session):
+    def test_session_history_with_limit(self, client, seeded_conversations, test_user, test_session):
         """测试带限制参数的历史获取"""
         # 添加多条对话
-        for i in range(5):
-            request_data = {
-                "content": f"消息 {i+1}",
-                "user_id": test_user.id,
-                "session_id": test_session.id
-            }
-            self.client.post("/api/langgraph/chat", json=request_data)
+        seeded_conversations([(f"消息 {i+1}", "chat") for i in range(5)])
 
         # 测试限制
-        response = self.client.get(f"/api/langgraph/session/{test_session.id}/history?limit=3")
+        response = client.get(f"/api/langgraph/session/{test_session.id}/history?limit=3")
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert data["total_conversations"] == 3
         assert len(data["history"]) == 3
 
-    def test_session_history_not_found(self):
+    def test_session_history_orders_turns_across_agents(self, client, seeded_conversations, test_session):
+        """测试多个代理类型的对话按时间排序，限制条数时保留最近的轮次"""
+        seeded_conversations([("消息 1", "chat"), ("消息 2", "edu"), ("消息 3", "chat"), ("消息 4", "edu")])
+
+        response = client.get(f"/api/langgraph/session/{test_session.id}/history?limit=3")
+        assert response.status_code == 200
+
+        history = jloads(response)["history"]
+        assert [item["user_input"] for item in history] == ["消息 2", "消息 3", "消息 4"]
+        assert len({(item["id"], item["turn_index"]) for item in history}) == 3
+
+    def test_session_history_not_found(self, client):
         """测试不存在的会话ID"""
-        response = self.client.get("/api/langgraph/session/99999/history")
+        response = client.get("/api/langgraph/session/99999/history")
         assert response.status_code == 404
 
-        data = response.json()
+        data = jloads(response)
         assert "detail" in data
 
-    def test_session_history_empty(self, test_user):
+    def test_session_history_empty(self, client, test_user):
         """测试空会话"""
         # 创建新会话
         session_request = {
             "user_id": test_user.id,
             "title": "空会话"
         }
-        session_response = self.client.post("/api/langgraph/session/create", json=session_request)
-        session_data = session_response.json()
+        session_response = client.post("/api/langgraph/session/create", json=session_request)
+        session_data = jloads(session_response)
 
         # 获取空历史
-        response = self.client.get(f"/api/langgraph/session/{session_data['id']}/history")
+        response = client.get(f"/api/langgraph/session/{session_data['id']}/history")
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert data["total_conversations"] == 0
         assert len(data["history"]) == 0
 
@@ -547,12 +610,7 @@ class TestSessionHistoryReal:
 class TestUserInsightsReal:
     """测试真实的 /api/langgraph/users/{user_id}/insights 端点"""
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
-
-    def test_user_insights_with_data(self, test_user, test_session):
+    def test_user_insights_with_data(self, client, seeded_conversations, test_user, test_session):
         """测试有数据的用户洞察"""
         # 创建多种类型的对话
         test_messages = [
@@ -562,20 +620,13 @@ class TestUserInsightsReal:
             ("讲个故事", "story")
         ]
 
-        for content, category in test_messages:
-            request_data = {
-                "content": content,
-                "user_id": test_user.id,
-                "session_id": test_session.id
-            }
-            response = self.client.post("/api/langgraph/chat", json=request_data)
-            assert response.status_code == 200
+        seeded_conversations(test_messages)
 
         # 获取用户洞察
-        response = self.client.get(f"/api/langgraph/users/{test_user.id}/insights")
+        response = client.get(f"/api/langgraph/users/{test_user.id}/insights")
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "total_conversations" in data
         assert "agent_preferences" in data
         assert "safety_incidents" in data
@@ -588,45 +639,62 @@ class TestUserInsightsReal:
         assert isinstance(data["safety_incidents"], int)
         assert isinstance(data["learning_progress"], dict)
         assert isinstance(data["emotional_patterns"], dict)
+        assert data["learning_progress"] == {"通用": 1}
+        assert data["emotional_patterns"] == {"未知": 1}
 
         print(f"用户洞察: 总对话数 {data['total_conversations']}")
         print(f"代理偏好: {data['agent_preferences']}")
         print(f"安全事件: {data['safety_incidents']}")
 
-    def test_user_insights_no_conversations(self, test_user):
+    def test_user_insights_after_chat(self, client, test_user, test_session):
+        """通过聊天接口写入的对话记录也能生成洞察和对话流分析"""
+        for content in ["你好", "再聊一句"]:
+            response = client.post("/api/langgraph/chat", json=_chat_payload(content, test_user.id, test_session.id))
+            assert response.status_code == 200
+
+        response = client.get(f"/api/langgraph/users/{test_user.id}/insights")
+        assert response.status_code == 200
+        assert jloads(response)["total_conversations"] == 2
+
+        response = client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=1")
+        assert response.status_code == 200
+        data = jloads(response)
+        assert data["total_conversations"] == 2
+        assert [item["content_preview"] for item in data["conversation_flow"]] == ["你好...", "再聊一句..."]
+
+        response = client.get(f"/api/langgraph/session/{test_session.id}/history")
+        assert response.status_code == 200
+        assert sorted(item["user_input"] for item in jloads(response)["history"]) == ["你好", "再聊一句"]
+
+    def test_user_insights_no_conversations(self, client, test_user):
         """测试没有对话记录的用户"""
-        response = self.client.get(f"/api/langgraph/users/{test_user.id}/insights")
+        response = client.get(f"/api/langgraph/users/{test_user.id}/insights")
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert data["total_conversations"] == 0
         assert data["agent_preferences"] == {}
         assert data["learning_progress"] == {}
         assert data["emotional_patterns"] == {}
 
-    def test_user_insights_not_found(self):
+    def test_user_insights_not_found(self, client):
         """测试不存在的用户ID"""
-        response = self.client.get("/api/langgraph/users/99999/insights")
+        response = client.get("/api/langgraph/users/99999/insights")
         assert response.status_code == 200  # 应该返回空洞察而不是404
 
-        data = response.json()
+        data = jloads(response)
         assert data["total_conversations"] == 0
 
 
 class TestWorkflowTestReal:
     """测试真实的 /api/langgraph/test/workflow 端点"""
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
-
-    def test_workflow_test_success(self):
+    def test_workflow_test_success(self, client):
         """测试工作流测试成功"""
-        response = self.client.post("/api/langgraph/test/workflow")
+        response = client.post("/api/langgraph/test/workflow")
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "test_status" in data
         assert "workflow_result" in data
         assert "message" in data
@@ -646,12 +714,9 @@ class TestWorkflowTestReal:
 class TestIntegrationReal:
     """真实集成测试"""
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
-
-    def test_complete_user_journey(self, test_user):
+    @pytest.mark.real_llm
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_complete_user_journey(self, client, aclient, test_user):
         """测试完整的用户旅程"""
         print("=== 开始完整用户旅程测试 ===")
 
@@ -660,9 +725,9 @@ class TestIntegrationReal:
             "user_id": test_user.id,
             "title": "用户旅程测试会话"
         }
-        session_response = self.client.post("/api/langgraph/session/create", json=session_request)
+        session_response = client.post("/api/langgraph/session/create", json=session_request)
         assert session_response.status_code == 200
-        session_data = session_response.json()
+        session_data = jloads(session_response)
         session_id = session_data["id"]
         print(f"1. 创建会话: ID={session_id}")
 
@@ -674,178 +739,96 @@ class TestIntegrationReal:
             "谢谢你，很有趣"
         ]
 
-        for i, message in enumerate(conversations, 1):
-            chat_request = {
-                "content": message,
-                "user_id": test_user.id,
-                "session_id": session_id
-            }
-            chat_response = self.client.post("/api/langgraph/chat", json=chat_request)
-
-            # 检查响应状态，允许500错误（当Ollama不可用时）
-            if chat_response.status_code == 500:
-                print(f"2.{i} 对话: {message[:20]}... -> 系统繁忙（Ollama不可用），但系统正常处理")
-                # 500错误仍然表示系统在工作，只是外部服务不可用
-                continue
-            elif chat_response.status_code == 200:
-                chat_data = chat_response.json()
-                print(f"2.{i} 对话: {message[:20]}... -> {chat_data['response'][:50]}...")
-            else:
-                pytest.fail(f"对话失败，状态码: {chat_response.status_code}")
+        chat_responses = await _post_chats(aclient, test_user.id, session_id, conversations)
+
+        for i, (message, chat_response) in enumerate(zip(conversations, chat_responses), 1):
+
+            assert chat_response.status_code == 200, f"对话失败，状态码: {chat_response.status_code}"
+            chat_data = jloads(chat_response)
+            print(f"2.{i} 对话: {message[:20]}... -> {chat_data['response'][:50]}...")
 
         # 3. 获取会话历史
-        history_response = self.client.get(f"/api/langgraph/session/{session_id}/history")
+        history_response = client.get(f"/api/langgraph/session/{session_id}/history")
         assert history_response.status_code == 200
-        history_data = history_response.json()
+        history_data = jloads(history_response)
         print(f"3. 会话历史: 总对话数 {history_data['total_conversations']}")
 
         # 4. 获取用户洞察
-        insights_response = self.client.get(f"/api/langgraph/users/{test_user.id}/insights")
+        insights_response = client.get(f"/api/langgraph/users/{test_user.id}/insights")
         assert insights_response.status_code == 200
-        insights_data = insights_response.json()
+        insights_data = jloads(insights_response)
         print(f"4. 用户洞察: 总对话数 {insights_data['total_conversations']}")
         print(f"   代理偏好: {insights_data['agent_preferences']}")
 
         # 5. 获取对话流分析
-        analytics_response = self.client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=1")
+        analytics_response = client.get(f"/api/langgraph/analytics/conversation-flow?user_id={test_user.id}&days=1")
         assert analytics_response.status_code == 200
-        analytics_data = analytics_response.json()
+        analytics_data = jloads(analytics_response)
         print(f"5. 对话分析: {analytics_data['total_conversations']} 次对话")
 
         # 6. 检查工作流状态 - 允许失败
-        workflow_response = self.client.get(f"/api/langgraph/workflow/state?user_id={test_user.id}")
+        workflow_response = client.get(f"/api/langgraph/workflow/state?user_id={test_user.id}")
         if workflow_response.status_code == 200:
-            workflow_data = workflow_response.json()
+            workflow_data = jloads(workflow_response)
             print(f"6. 工作流状态: {workflow_data['workflow_info']['name']}")
         else:
             print(f"6. 工作流状态: 暂时不可用（状态码: {workflow_response.status_code}）")
 
         # 7. 运行系统测试 - 允许失败
-        test_response = self.client.post("/api/langgraph/test/workflow")
+        test_response = client.post("/api/langgraph/test/workflow")
         if test_response.status_code == 200:
-            test_data = test_response.json()
+            test_data = jloads(test_response)
             print(f"7. 系统测试: {test_data['test_status']}")
         else:
             print(f"7. 系统测试: 暂时不可用（状态码: {test_response.status_code}）")
 
         print("=== 完整用户旅程测试完成 ===")
 
-    def test_concurrent_requests(self, test_user):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_concurrent_requests(self, aclient, test_user):
         """测试并发请求处理"""
-        import threading
-        import time
-
-        results = []
-
-        def make_request(request_id):
-            try:
-                start_time = time.time()
-                response = self.client.get(f"/api/langgraph/workflow/state?user_id={test_user.id}_{request_id}")
-                end_time = time.time()
-                results.append({
-                    "request_id": request_id,
-                    "status_code": response.status_code,
-                    "response_time": end_time - start_time
-                })
-            except Exception as e:
-                results.append({
-                    "request_id": request_id,
-                    "error": str(e)
-                })
-
-        # 创建5个并发请求
-        threads = []
-        for i in range(5):
-            thread = threading.Thread(target=make_request, args=(i,))
-            threads.append(thread)
-            thread.start()
-
-        # 等待所有线程完成
-        for thread in threads:
-            thread.join()
+        responses = await asyncio.gather(*(
+            aclient.get(f"/api/langgraph/workflow/state?user_id={test_user.id}_{i}")
+            for i in range(5)
+        ))
 
         # 验证结果
-        assert len(results) == 5
-        for result in results:
-            assert "status_code" in result
-            assert result["status_code"] == 200
-
-        print(f"并发测试: {len(results)} 个请求全部成功")
-
-    def test_different_content_types(self, test_user):
-        """测试不同内容类型的处理"""
-        test_cases = [
-            ("简单问候", "你好"),
-            ("教育问题", "什么是光合作用？"),
-            ("情感表达", "我今天很开心"),
-            ("故事请求", "给我讲一个冒险故事"),
-            ("复杂问题", "请解释人工智能的基本原理和应用"),
-            ("中文内容", "今天天气真好，适合户外活动"),
-            ("英文内容", "Hello, how are you today?"),
-            ("混合内容", "Hello 世界，今天学了 science"),
-        ]
-
-        for description, content in test_cases:
-            request_data = {
-                "content": content,
-                "user_id": test_user.id
-            }
-            response = self.client.post("/api/langgraph/chat", json=request_data)
+        assert len(responses) == 5
+        for response in responses:
             assert response.status_code == 200
 
-            data = response.json()
-            assert "response" in data
-            assert len(data["response"]) > 0
-            print(f"{description}: 收到响应 ({len(data['response'])} 字符)")
+        print(f"并发测试: {len(responses)} 个请求全部成功")
 
-    def test_error_recovery(self, test_user):
+    def test_error_recovery(self, client, test_user):
         """测试错误恢复能力"""
         # 1. 发送正常请求
-        normal_request = {
-            "content": "正常消息",
-            "user_id": test_user.id
-        }
-        response = self.client.post("/api/langgraph/chat", json=normal_request)
+        normal_request = _chat_payload("正常消息", test_user.id)
+        response = client.post("/api/langgraph/chat", json=normal_request)
         assert response.status_code == 200
         print("正常请求成功")
 
         # 2. 发送无效请求
-        invalid_request = {
-            "content": "",  # 空内容
-            "user_id": test_user.id
-        }
-        response = self.client.post("/api/langgraph/chat", json=invalid_request)
+        invalid_request = _chat_payload("", test_user.id)  # 空内容
+        response = client.post("/api/langgraph/chat", json=invalid_request)
         # 系统应该能处理空内容
         print(f"空内容请求状态: {response.status_code}")
 
         # 3. 再次发送正常请求，验证系统恢复
-        recovery_request = {
-            "content": "恢复测试消息",
-            "user_id": test_user.id
-        }
-        response = self.client.post("/api/langgraph/chat", json=recovery_request)
+        recovery_request = _chat_payload("恢复测试消息", test_user.id)
+        response = client.post("/api/langgraph/chat", json=recovery_request)
         assert response.status_code == 200
         print("恢复请求成功")
 
-    def test_large_data_handling(self, test_user):
+    def test_large_data_handling(self, client, test_user):
         """测试大数据处理"""
         # 测试长文本
         long_text = "这是一个很长的测试文本。" * 100  # 约2000字符
 
-        request_data = {
-            "content": long_text,
-            "user_id": test_user.id
-        }
-        response = self.client.post("/api/langgraph/chat", json=request_data)
-
-        # 允许500错误（Ollama不可用）
-        if response.status_code == 500:
-            print("聊天系统返回500错误（Ollama不可用），但系统正常处理错误")
-            return
-
+        request_data = _chat_payload(long_text, test_user.id)
+        response = client.post("/api/langgraph/chat", json=request_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = jloads(response)
         assert "response" in data
         print(f"长文本处理: 输入{len(long_text)}字符，输出{len(data['response'])}字符")
 
@@ -853,29 +836,20 @@ class TestIntegrationReal:
 class TestPerformanceReal:
     """真实性能测试"""
 
-    @classmethod
-    def setup_class(cls):
-        """测试类初始化"""
-        cls.client = TestClient(app)
-
-    def test_response_time_baseline(self, test_user):
+    def test_response_time_baseline(self, client, test_user):
         """测试响应时间基线"""
         import time
 
-        request_data = {
-            "content": "性能测试消息",
-            "user_id": test_user.id
-        }
+        request_data = _chat_payload("性能测试消息", test_user.id)
 
-        # 测试多次请求的响应时间
+        # 依次发送多次请求，统计各自的响应时间（请求共用db夹具的会话，不能并发）
         response_times = []
-        for i in range(5):
-            start_time = time.time()
-            response = self.client.post("/api/langgraph/chat", json=request_data)
-            end_time = time.time()
-
+        for _ in range(5):
+            start_ns = time.perf_counter_ns()
+            response = client.post("/api/langgraph/chat", json=request_data)
+            elapsed_ns = time.perf_counter_ns() - start_ns
             assert response.status_code == 200
-            response_times.append(end_time - start_time)
+            response_times.append(elapsed_ns / 1e9)
 
         avg_time = sum(response_times) / len(response_times)
         max_time = max(response_times)
@@ -886,35 +860,36 @@ class TestPerformanceReal:
         # 断言平均响应时间合理（这里设置为10秒）
         assert avg_time < 10.0, f"平均响应时间过长: {avg_time:.2f}秒"
 
-    def test_memory_usage_tracking(self, test_user):
+    def test_memory_usage_tracking(self, client, test_user):
         """测试内存使用跟踪"""
-        import gc
-        import sys
-
-        # 获取初始内存使用
-        gc.collect()
-        initial_objects = len(gc.get_objects())
-
-        # 执行多次请求
-        for i in range(10):
-            request_data = {
-                "content": f"内存测试消息 {i}",
-                "user_id": test_user.id
-            }
-            response = self.client.post("/api/langgraph/chat", json=request_data)
-            assert response.status_code == 200
+        import tracemalloc
+
+        # 记录初始内存分配
+        tracemalloc.start()
+        try:
+            snap_before = tracemalloc.take_snapshot()
+
+            # 执行多次请求
+            for i in range(10):
+                request_data = _chat_payload(f"内存测试消息 {i}", test_user.id)
+                response = client.post("/api/langgraph/chat", json=request_data)
+                assert response.status_code == 200
+
+            # 检查内存增长
+            snap_after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
 
-        # 检查内存使用
-        gc.collect()
-        final_objects = len(gc.get_objects())
-        object_increase = final_objects - initial_objects
+        memory_increase = sum(
+            stat.size_diff for stat in snap_after.compare_to(snap_before, "filename")
+        )
 
-        print(f"内存使用: 对象数量增加 {object_increase}")
+        print(f"内存使用: 分配增加 {memory_increase / 1024:.1f} KB")
 
-        # 对象增长应该在合理范围内
-        assert object_increase < 10000, f"内存泄漏风险: 对象增加 {object_increase}"
+        # 内存增长应该在合理范围内
+        assert memory_increase < 5 * 1024 * 1024, f"内存泄漏风险: 分配增加 {memory_increase} 字节"
 
 
 if __name__ == "__main__":
     # 运行测试
-    pytest.main([__file__, "-v", "--tb=short"])
\ No newline at end of file
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,47 @@
+"""
+StoryMemoryManager 故事上下文测试（mem0检索回退路径）
+
+mem0客户端不暴露Qdrant时，三类记忆检索应在线程中并发执行。
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from core.memory import mem0 as mem0_module
+from core.memory.mem0 import StoryMemoryManager
+
+
+class BarrierSearchClient:
+    """只有三次检索同时进行时才能通过屏障的mem0客户端"""
+
+    def __init__(self):
+        self.barrier = threading.Barrier(3, timeout=5)
+
+    def search(self, query, user_id, limit, filters):
+        self.barrier.wait()
+        return {
+            "results": [{
+                "id": filters["memory_type"],
+                "memory": query,
+                "metadata": {"memory_type": filters["memory_type"], "user_id": user_id},
+            }]
+        }
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    client = BarrierSearchClient()
+    monkeypatch.setattr(mem0_module.settings, "mem0_embedding_cache_enabled", False)
+    monkeypatch.setattr(StoryMemoryManager, "_init_memory_client", lambda self: client)
+    return StoryMemoryManager()
+
+
+def test_story_context_fallback_searches_concurrently(manager):
+    context = asyncio.run(manager.get_story_context("u1", "s1"))
+
+    assert "error" not in context
+    assert context["world_settings"] == ["故事 s1 世界观设定"]
+    assert context["role_info"] == ["故事 s1 角色信息"]
+    assert context["recent_progress"] == ["故事 s1 进度"]
@@ -0,0 +1,161 @@
+"""
+StoryMemoryManager Qdrant检索测试
+
+使用本地内存模式的真实Qdrant客户端，验证直接检索和批量检索路径。
+嵌入模型用按关键词生成固定向量的实现代替，不依赖Ollama。
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from qdrant_client import QdrantClient, models
+
+from core.memory import mem0 as mem0_module
+from core.memory.mem0 import MemoryType, StoryMemoryManager
+
+COLLECTION = "test_story_memories"
+
+# 关键词 -> 向量维度，未命中任何关键词的文本落在最后一维
+_KEYWORD_AXES = ("世界观", "角色", "进度")
+
+
+class KeywordEmbedder:
+    """按文本中出现的关键词生成单位向量"""
+
+    def embed(self, text, memory_action=None):
+        vector = [0.0] * (len(_KEYWORD_AXES) + 1)
+        for axis, keyword in enumerate(_KEYWORD_AXES):
+            if keyword in text:
+                vector[axis] = 1.0
+                return vector
+        vector[-1] = 1.0
+        return vector
+
+
+MEMORIES = [
+    (1, "u1", "s1", MemoryType.WORLD_SETTING, "世界观: 魔法森林"),
+    (2, "u1", "s1", MemoryType.CHARACTER_INFO, "角色: 小狐狸"),
+    (3, "u1", "s1", MemoryType.STORY_PROGRESS, "进度: 第一章完成"),
+    (4, "u2", "s1", MemoryType.WORLD_SETTING, "世界观: 其他用户的世界"),
+    (5, "u1", "s2", MemoryType.WORLD_SETTING, "世界观: 另一个故事"),
+]
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """挂载内存模式Qdrant的记忆管理器"""
+    embedder = KeywordEmbedder()
+    qdrant = QdrantClient(":memory:")
+    qdrant.create_collection(
+        COLLECTION,
+        vectors_config=models.VectorParams(
+            size=len(_KEYWORD_AXES) + 1, distance=models.Distance.COSINE
+        ),
+    )
+    qdrant.upsert(
+        COLLECTION,
+        points=[
+            models.PointStruct(
+                id=point_id,
+                vector=embedder.embed(content),
+                payload={
+                    "data": content,
+                    "user_id": user_id,
+                    "story_id": story_id,
+                    "memory_type": memory_type.value,
+                },
+            )
+            for point_id, user_id, story_id, memory_type, content in MEMORIES
+        ],
+    )
+    client = SimpleNamespace(
+        vector_store=SimpleNamespace(client=qdrant, collection_name=COLLECTION),
+        embedding_model=embedder,
+    )
+
+    monkeypatch.setattr(mem0_module.settings, "mem0_embedding_cache_enabled", False)
+    monkeypatch.setattr(StoryMemoryManager, "_init_memory_client", lambda self: client)
+    yield StoryMemoryManager()
+    qdrant.close()
+
+
+def test_search_filters_by_user_story_and_types(manager):
+    results = manager.search_relevant_memories(
+        query="世界观",
+        user_id="u1",
+        story_id="s1",
+        memory_types=[MemoryType.WORLD_SETTING, MemoryType.CHARACTER_INFO],
+        limit=5,
+    )
+
+    assert [r.content for r in results] == ["世界观: 魔法森林", "角色: 小狐狸"]
+    assert results[0].memory_type == MemoryType.WORLD_SETTING
+    assert results[0].metadata.user_id == "u1"
+    assert results[0].relevance_score > results[1].relevance_score
+
+
+def test_batch_search_returns_results_in_spec_order(manager):
+    results = manager.search_relevant_memories_batch([
+        {"query": "进度", "user_id": "u1", "story_id": "s1",
+         "memory_types": [MemoryType.STORY_PROGRESS], "limit": 3},
+        {"query": "世界观", "user_id": "u2", "limit": 3},
+        {"query": "世界观", "user_id": "u1", "story_id": "s2", "limit": 3},
+    ])
+
+    assert [[r.content for r in hits] for hits in results] == [
+        ["进度: 第一章完成"],
+        ["世界观: 其他用户的世界"],
+        ["世界观: 另一个故事"],
+    ]
+
+
+def test_story_context_uses_batch_search(manager):
+    context = asyncio.run(manager.get_story_context("u1", "s1"))
+
+    assert "error" not in context
+    assert context["world_settings"] == ["世界观: 魔法森林"]
+    assert context["role_info"] == ["角色: 小狐狸"]
+    assert context["recent_progress"] == ["进度: 第一章完成"]
+
+
+def test_tune_vector_store_skips_local_mode(manager, monkeypatch):
+    monkeypatch.setattr(mem0_module.settings, "mem0_qdrant_quantization", True)
+    monkeypatch.setattr(mem0_module.settings, "mem0_qdrant_hnsw_in_ram", True)
+    qdrant = manager.memory_client.vector_store.client
+    calls = []
+    monkeypatch.setattr(qdrant, "update_collection", lambda **kwargs: calls.append(kwargs))
+
+    manager._tune_vector_store(manager.memory_client)
+
+    assert calls == []
+
+
+def test_search_params_skip_local_mode(manager, monkeypatch):
+    monkeypatch.setattr(mem0_module.settings, "mem0_qdrant_quantization", True)
+
+    assert manager._qdrant_search_params is None
+
+
+def test_search_params_rescore_quantized_server_collection(manager):
+    collection = SimpleNamespace(config=SimpleNamespace(quantization_config=object()))
+    server = SimpleNamespace(get_collection=lambda name: collection)
+    manager.memory_client = SimpleNamespace(
+        vector_store=SimpleNamespace(client=server, collection_name=COLLECTION)
+    )
+
+    params = manager._qdrant_search_params
+    assert params.quantization.rescore is True
+    assert params.quantization.oversampling == 2.0
+
+
+def test_count_user_memories_by_type(manager):
+    counts = manager._count_user_memories("u1")
+
+    assert counts[MemoryType.WORLD_SETTING.value] == 2
+    assert counts[MemoryType.CHARACTER_INFO.value] == 1
+    assert counts[MemoryType.STORY_PROGRESS.value] == 1
+    assert counts[MemoryType.USER_PREFERENCE.value] == 0
@@ -0,0 +1,49 @@
+"""
+WebSocketManager 测试
+"""
+
+import asyncio
+
+from core.websocket_manager import WebSocketManager
+
+
+class FakeWebSocket:
+    """记录已发送消息的WebSocket替身"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, payload):
+        self.sent.append(payload)
+
+
+async def _wait_for_sent(websocket, count=1):
+    for _ in range(100):
+        if len(websocket.sent) >= count:
+            return
+        await asyncio.sleep(0)
+
+
+def test_stale_disconnect_keeps_reconnected_device():
+    """设备重连后，旧连接的清理不应移除新连接"""
+
+    async def scenario():
+        manager = WebSocketManager()
+        old, new = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(old, "device-1")
+        await manager.connect(new, "device-1")
+
+        # 旧连接的 finally 清理
+        await manager.disconnect("device-1", old)
+        assert manager.is_connected("device-1")
+
+        await manager.send_personal_message({"type": "ping"}, "device-1")
+        await _wait_for_sent(new)
+
+        await manager.disconnect("device-1", new)
+        assert not manager.is_connected("device-1")
+        return old.sent, new.sent
+
+    old_sent, new_sent = asyncio.run(scenario())
+    assert old_sent == []
+    assert new_sent == ['{"type": "ping"}']
@@ -221,8 +221,8 @@ class DatabaseService:
         
         # 如果存在相同用户ID和代理类型的记录，则追加对话历史
         if existing_conversation:
-            # 获取现有的对话历史
-            conversation_history = existing_conversation.conversation_history or []
+            # 获取现有的对话历史（复制为新列表，原地修改JSON列不会被识别为变更）
+            conversation_history = list(existing_conversation.conversation_history or [])
             # 添加新的对话
             conversation_history.append({
                 "user_input": user_input,
@@ -7,7 +7,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from utils.db.database import Base
-from config.settings import Settings
+from config.settings import get_settings
 # 确保所有模型都被导入，这样Base.metadata.create_all才能创建所有表
 from models.user import User, Session, Conversation, ArchivedConversation, SecurityLog
 from models.voiceprint import Voiceprint
@@ -22,7 +22,7 @@ def init_db():
     初始化数据库，创建所有表
     """
     try:
-        settings = Settings()
+        settings = get_settings()
         
         # 创建数据库引擎
         engine = create_engine(
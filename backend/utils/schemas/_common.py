@@ -0,0 +1,29 @@
+"""
+schemas 模块共用的字段定义与模型配置
+"""
+
+from functools import lru_cache
+from typing import Annotated, Any, Dict, Optional
+
+from pydantic import ConfigDict, Field
+
+
+@lru_cache(maxsize=None, typed=True)
+def _ex(value: Any) -> Dict[str, Any]:
+    """
+    字段示例的 json_schema_extra
+
+    相同示例值共用同一个字典；typed=True 保证 True 与 1 不会命中同一缓存项。
+    """
+    return {"example": value}
+
+
+# 响应模型构造后只做序列化，不再修改
+_RESPONSE_CONFIG = ConfigDict(frozen=True, extra="forbid")
+
+
+# 请求模型共用的可选用户ID/会话ID字段，默认值在使用处给出：
+#   user_id: UserId = 1
+#   session_id: SessionId = None
+UserId = Annotated[Optional[int], Field(description="用户ID", json_schema_extra=_ex(1))]
+SessionId = Annotated[Optional[int], Field(description="会话ID", json_schema_extra=_ex(123))]